@@ -116,6 +116,11 @@ class DomainIntentEngine:
             entity_name, samples, intent_name=intent_name
         )
 
+    def finalize(self) -> None:
+        """Build the keyword matchers of every domain engine up front."""
+        for engine in self.domains.values():
+            engine.finalize()
+
     # ── query API ──────────────────────────────────────────────────────────
 
     def calc_intent(self, query: str,
@@ -1,16 +1,22 @@
-import random
+import copy
 import threading
-from collections import defaultdict
-from typing import List, Optional, Dict, Union, Tuple
-from concurrent.futures import ThreadPoolExecutor
+import zlib
+from collections import defaultdict, OrderedDict
+from itertools import chain
+from typing import Iterable, List, Optional, Dict, Union, Tuple, Set
+
+import numpy as np
+from joblib import Parallel, delayed
 from quebra_frases import word_tokenize
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
+from scipy.sparse import csr_matrix
+from scipy.special import expit
+from sklearn.base import clone
 from sklearn.calibration import CalibratedClassifierCV
-from sklearn.linear_model import Perceptron, LogisticRegressionCV, SGDClassifier
+from sklearn.linear_model import Perceptron, LogisticRegression, LogisticRegressionCV, SGDClassifier
 from sklearn.neural_network import MLPClassifier
 from sklearn.svm import SVC
 
-from linha_fina.keywords import KeywordFeatures
 from linha_fina.templates import TemplateMatcher
 
 try:
@@ -21,7 +27,155 @@ except:
 
 # Type aliases
 TrainingData = List[Tuple[List[float], str]]
-Model = Union[Perceptron, SVC, LogisticRegressionCV, MLPClassifier, SGDClassifier]
+Model = Union[Perceptron, SVC, LogisticRegression, LogisticRegressionCV, MLPClassifier, SGDClassifier]
+
+# tokens shorter than this carry no feature, same cut-off as KeywordFeatures matching
+MIN_TOKEN_LEN = 3
+
+
+class TokenVocabulary:
+    """
+    An append-only lowercased token -> feature column map with memoized sentence encodings.
+
+    Shared by every :class:`DynamicBinaryClassifier` of a :class:`DynamicClassifier`, so all
+    per-label models use the same columns and a sentence is encoded once for all of them.
+    Columns never shift, a model fitted on the first N columns stays valid as the map grows.
+    """
+
+    def __init__(self, query_cache_size: int = 1024):
+        self.columns: Dict[str, int] = {}
+        # sparse one-hot rows of already seen sentences, valid while the vocabulary is unchanged
+        self._cache: Dict[str, np.ndarray] = {}
+        self._cache_size: int = 0
+        # word_tokenize output survives vocabulary changes, training sentences are kept for good,
+        # open-ended queries only in a bounded LRU
+        self._tokens: Dict[str, List[str]] = {}
+        self._query_tokens: OrderedDict = OrderedDict()
+        self.query_cache_size = query_cache_size
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def tokenize(self, text: str, cache: bool = True) -> List[str]:
+        """
+        Memoized :func:`word_tokenize`.
+
+        Args:
+            text (str): The input text.
+            cache (bool): Keep the tokens for good, otherwise only in the bounded query cache.
+
+        Returns:
+            List[str]: The tokens of the text, original casing.
+        """
+        tokens = self._tokens.get(text)
+        if tokens is not None:
+            return tokens
+        tokens = self._query_tokens.get(text)
+        if tokens is not None:
+            self._query_tokens.move_to_end(text)
+        else:
+            tokens = word_tokenize(text)
+        if cache:
+            self._tokens[text] = tokens
+            self._query_tokens.pop(text, None)
+        elif self.query_cache_size > 0:
+            self._query_tokens[text] = tokens
+            if len(self._query_tokens) > self.query_cache_size:
+                self._query_tokens.popitem(last=False)
+        return tokens
+
+    def add(self, tokens: List[str]) -> None:
+        """
+        Assigns a column to every token not in the vocabulary yet, short tokens get none.
+
+        Args:
+            tokens (List[str]): The tokens to register.
+        """
+        for tok in tokens:
+            if len(tok) < MIN_TOKEN_LEN:
+                continue
+            tok = tok.lower()
+            if tok not in self.columns:
+                self.columns[tok] = len(self.columns)
+
+    def encode(self, text: str, cache: bool = True) -> np.ndarray:
+        """
+        Sorted feature columns that are hot for the text.
+
+        Looks the text tokens up in the column map directly, so encoding costs
+        O(tokens in text) rather than a scan over the whole vocabulary.
+
+        Args:
+            text (str): The input text.
+            cache (bool): Whether to memoize the encoding until the vocabulary changes.
+
+        Returns:
+            np.ndarray: The column indices of the active features.
+        """
+        if self._cache_size != len(self):
+            self._cache = {}
+            self._cache_size = len(self)
+        if text in self._cache:
+            return self._cache[text]
+        # a text made only of short tokens encodes to an empty row
+        tokens = [t.lower() for t in self.tokenize(text, cache=cache) if len(t) >= MIN_TOKEN_LEN]
+        indices = np.array(sorted(self._columns_of(tokens)), dtype=np.int32)
+        if cache:
+            self._cache[text] = indices
+        return indices
+
+    def _columns_of(self, tokens: List[str]) -> Set[int]:
+        """The columns of the known tokens, unknown tokens have no feature."""
+        cols = self.columns
+        return {cols[t] for t in tokens if t in cols}
+
+    def matrix(self, texts: Iterable[str], cache: bool = True) -> csr_matrix:
+        """
+        Stacks the one-hot features of several texts into a sparse CSR matrix.
+
+        The matrix is assembled from three flat arrays (row offsets, column indices, values),
+        no per-row vectors are materialized.
+
+        Args:
+            texts (Iterable[str]): The input texts.
+            cache (bool): Whether to memoize the encodings, see :meth:`encode`.
+
+        Returns:
+            csr_matrix: A (len(texts), vocabulary size) int8 matrix, one row per text. While the
+                vocabulary is empty (only short tokens seen) it has a single all-zero column.
+        """
+        rows = [self.encode(text, cache=cache) for text in texts]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in rows], out=indptr[1:])
+        indices = np.concatenate(rows) if rows else np.empty(0, dtype=np.int32)
+        data = np.ones(len(indices), dtype=np.int8)
+        # models can't be fitted on zero features, pad with one column no token maps to
+        return csr_matrix((data, indices, indptr), shape=(len(rows), max(len(self), 1)))
+
+
+class HashingVocabulary(TokenVocabulary):
+    """
+    A fixed width vocabulary that hashes every token into one of ``n_features`` columns.
+
+    Trades a small collision rate for a feature width that no longer grows with every
+    registered token, see :class:`sklearn.feature_extraction.text.HashingVectorizer`.
+    Unseen tokens get a column too, nothing needs to be registered.
+    """
+
+    def __init__(self, n_features: int = 2 ** 14):
+        super().__init__()
+        self.n_features = n_features
+
+    def __len__(self) -> int:
+        return self.n_features
+
+    def add(self, tokens: List[str]) -> None:
+        """Nothing to register, every token already maps to a hash bucket."""
+
+    def _columns_of(self, tokens: List[str]) -> Set[int]:
+        # crc32 because the builtin str hash is salted per process, columns must be stable
+        n = self.n_features
+        return {zlib.crc32(t.encode("utf-8")) % n for t in tokens}
 
 
 class DynamicBinaryClassifier:
@@ -30,37 +184,64 @@ class DynamicBinaryClassifier:
     and uses one-hot encoding for feature extraction.
     """
 
-    def __init__(self):
+    def __init__(self, vocabulary: Optional[TokenVocabulary] = None,
+                 use_hashing: bool = False, n_features: int = 2 ** 14):
         """
-        Initializes the binary classifier with empty datasets and a keyword featurizer.
+        Initializes the binary classifier with empty datasets and a token vocabulary.
+
+        Args:
+            vocabulary (Optional[TokenVocabulary]): Token -> column map used for encoding, shared if given.
+            use_hashing (bool): Hash tokens into a fixed number of columns instead of growing
+                the vocabulary, ignored when a vocabulary is given.
+            n_features (int): Feature width in hashing mode.
         """
         self.positives: List[str] = []
         self.negatives: List[str] = []
-        self.featurizer = KeywordFeatures(use_automatons=False)
+        # membership mirrors of positives/negatives for O(1) lookups
+        self._positives_set: Set[str] = set()
+        self._negatives_set: Set[str] = set()
+        if vocabulary is None:
+            vocabulary = HashingVocabulary(n_features) if use_hashing else TokenVocabulary()
+        self.vocabulary = vocabulary
         self._needs_training: bool = True
         self.model: Optional[Model] = None
+        # what the current model has seen, so partial_train can feed it only the deltas
+        self._trained_version: Optional[int] = None
+        self._fit_count: int = 0
+        # bumped on every sample change, tells whether samples arrived while a fit was running
+        self._revision: int = 0
+        self._trained_positives_count: int = 0
+        self._trained_negatives: Set[str] = set()
         self._neg_scores: Dict[str, float] = {}
 
     def init_model(self, model: Optional[Model] = None) -> None:
         """
-        Initializes an MLPClassifier with appropriate architecture based on featurizer labels.
+        Initializes the model, a liblinear LogisticRegression unless one is given.
+
+        The one-hot features are sparse and close to linearly separable, liblinear fits them in
+        milliseconds and provides predict_proba natively, no calibration wrapper needed.
+        Regularization is kept weak and classes balanced since there are few samples per intent
+        and up to 3 negatives per positive.
         """
-        self.model = model or MLPClassifier()  # SVC(probability=True, random_state=42)
+        self.model = model or LogisticRegression(solver="liblinear", C=10.0, class_weight="balanced")
         if not hasattr(self.model, "predict_proba"):
             self.model = CalibratedClassifierCV(self.model)
 
     def add_positive(self, sents: List[str]) -> None:
         """
-        Adds positive samples and updates the featurizer.
+        Adds positive samples and registers their tokens in the vocabulary.
 
         Args:
             sents (List[str]): A list of positive sentences.
         """
         self.positives += sents
+        self._positives_set.update(sents)
         self._needs_training = True
+        self._revision += 1
+        if isinstance(self.vocabulary, HashingVocabulary):
+            return  # hashed features need no vocabulary
         for s in sents:
-            for tok in word_tokenize(s):
-                self.featurizer.register_entity(tok, [tok])
+            self.vocabulary.add(self.vocabulary.tokenize(s))
 
     def add_negative(self, sents: List[str]) -> None:
         """
@@ -72,21 +253,27 @@ class DynamicBinaryClassifier:
         self.negatives += sents
         # don't use too much data, otherwise the classifier can just learn to never match
         max_negs = 3 * len(self.positives)
-        if self.positives:
+        # under the cap every negative is kept, scores are only needed to rank an excess
+        if self.positives and len(self.negatives) > max_negs:
             #LOG.debug(f"Reference sample: {self.positives[0]}")
-            for s in self.negatives:
-                if s not in self._neg_scores:
-                    self._neg_scores[s] = fuzz.token_set_ratio(s, self.positives[0])
+            new = [s for s in dict.fromkeys(self.negatives) if s not in self._neg_scores]
+            if new:
+                # score all unseen negatives against the reference sample in one call
+                scores = process.cdist(new, self.positives[:1],
+                                       scorer=fuzz.token_set_ratio, workers=-1)[:, 0]
+                self._neg_scores.update(zip(new, scores.tolist()))
             # select most relevant samples to keep, whatever helps disambiguate better
-            if len(self.negatives) > max_negs:
-                scored = sorted(self.negatives, key=lambda k: self._neg_scores[k], reverse=False)
-                self.negatives = scored[:max_negs]
-                #LOG.debug(f"Selected negative samples: {self.negatives}")
+            scores = np.array([self._neg_scores[s] for s in self.negatives])
+            keep = np.sort(np.argpartition(scores, max_negs)[:max_negs])
+            self.negatives = [self.negatives[i] for i in keep]
+            #LOG.debug(f"Selected negative samples: {self.negatives}")
+        self._negatives_set = set(self.negatives)
         self._needs_training = True
+        self._revision += 1
 
     def one_hot_encode(self, text: str) -> List[int]:
         """
-        Converts text into a one-hot encoded vector using the featurizer.
+        Converts text into a one-hot encoded vector over the token vocabulary.
 
         Args:
             text (str): The input text.
@@ -94,41 +281,150 @@ class DynamicBinaryClassifier:
         Returns:
             List[int]: The one-hot encoded feature vector.
         """
-        return self.featurizer.one_hot_encode(text)
+        vec = [0] * len(self.vocabulary)
+        for idx in self.vocabulary.encode(text):
+            vec[idx] = 1
+        return vec
+
+    def one_hot_encode_sparse(self, text: str, cache: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Converts text into the non-zero entries of its one-hot feature vector.
+
+        Args:
+            text (str): The input text.
+            cache (bool): Whether to memoize the encoding until the vocabulary changes.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The column indices of the active features and their values.
+        """
+        indices = self.vocabulary.encode(text, cache=cache)
+        return indices, np.ones(len(indices), dtype=np.int8)
+
+    def feature_matrix(self, texts: Iterable[str], cache: bool = True) -> csr_matrix:
+        """
+        Stacks the one-hot features of several texts into a sparse CSR matrix.
+
+        Args:
+            texts (Iterable[str]): The input texts.
+            cache (bool): Whether to memoize the encodings, see :meth:`TokenVocabulary.encode`.
+
+        Returns:
+            csr_matrix: A (len(texts), vocabulary size) int8 matrix, one row per text.
+        """
+        return self.vocabulary.matrix(texts, cache=cache)
+
+    def _fitted_columns(self, X: csr_matrix) -> csr_matrix:
+        """Drops columns of tokens registered after the model was fitted, the model never saw them."""
+        if self._trained_version is not None and X.shape[1] > self._trained_version:
+            return X[:, :self._trained_version]
+        return X
 
     @property
     def training_data(self) -> TrainingData:
         """
         Prepares the training data by combining positive and negative samples.
 
+        Dense view of :meth:`_build_training_arrays`, kept for inspection; training uses the arrays.
+
         Returns:
             A list of tuples where each tuple contains a feature vector and a label.
         """
-        data: TrainingData = []
-        for s in self.positives:
-            data.append((self.one_hot_encode(s), "intent"))
-        for s in self.negatives:
-            data.append((self.one_hot_encode(s), "not-intent"))
-        random.shuffle(data)
-        return data
+        X, Y = self._build_training_arrays()
+        return list(zip(X.toarray().tolist(), Y.tolist()))
+
+    def _build_training_arrays(self) -> Tuple[csr_matrix, np.ndarray]:
+        """
+        Shuffles the positive and negative samples into a feature matrix and its labels.
+
+        Returns:
+            Tuple[csr_matrix, np.ndarray]: The feature matrix and the label of each row.
+        """
+        n_pos, n_neg = len(self.positives), len(self.negatives)
+        X = self.feature_matrix(chain(self.positives, self.negatives))
+        Y = np.repeat(np.array(["intent", "not-intent"]), [n_pos, n_neg])
+        # shuffle matrix rows in place of the sample lists, no permuted copies of the texts
+        order = np.random.permutation(n_pos + n_neg)
+        return X[order], Y[order]
 
     def train(self) -> None:
         """
         Trains the model using the prepared training data.
         """
         if self.positives and self.negatives:
-            X, Y = zip(*self.training_data)
+            snapshot = self._snapshot()
+            X, Y = self._build_training_arrays()
             if self.model is None:
                 self.init_model()
-            self.model.fit(list(X), list(Y))
-            self._needs_training = False
+            self.model.fit(X, Y)
+            self._mark_trained(snapshot, X.shape[1])
+
+    def _snapshot(self) -> Tuple[int, int, Set[str]]:
+        """The sample revision, positives count and negatives a fit is about to see."""
+        return self._revision, len(self.positives), set(self.negatives)
+
+    def _mark_trained(self, snapshot: Optional[Tuple[int, int, Set[str]]] = None,
+                      width: Optional[int] = None) -> None:
+        """
+        Records the samples and vocabulary the model was just fitted on.
+
+        Args:
+            snapshot (Optional[Tuple[int, int, Set[str]]]): :meth:`_snapshot` taken before the fit,
+                defaults to the current state. Samples added since keep the classifier pending.
+            width (Optional[int]): Number of feature columns the model was fitted on.
+        """
+        revision, n_positives, negatives = snapshot or self._snapshot()
+        self._needs_training = self._revision != revision
+        self._fit_count += 1
+        self._trained_version = len(self.vocabulary) if width is None else width
+        self._trained_positives_count = n_positives
+        self._trained_negatives = negatives
+
+    @property
+    def can_partial_train(self) -> bool:
+        """
+        Whether new samples can be fed to the fitted model without refitting from scratch.
+
+        Requires a model with ``partial_fit`` and an unchanged vocabulary, since any new token
+        changes the feature columns the model was fitted on.
+        """
+        return (self.model is not None
+                and hasattr(self.model, "partial_fit")
+                and self._trained_version == len(self.vocabulary))
+
+    def partial_train(self, new_pos: Optional[List[str]] = None,
+                      new_neg: Optional[List[str]] = None) -> None:
+        """
+        Incrementally trains the model on samples it has not seen yet, via ``partial_fit``.
+
+        The update runs on a copy that then replaces the model, so predictions running
+        meanwhile never see half-updated weights. Falls back to a full :meth:`train` when
+        the model can not be updated incrementally.
+
+        Args:
+            new_pos (Optional[List[str]]): New positive samples, defaults to those added since the last fit.
+            new_neg (Optional[List[str]]): New negative samples, defaults to those added since the last fit.
+        """
+        if not self.can_partial_train:
+            self.train()
+            return
+        if new_pos is None:
+            new_pos = self.positives[self._trained_positives_count:]
+        if new_neg is None:
+            new_neg = [s for s in self.negatives if s not in self._trained_negatives]
+        if new_pos or new_neg:
+            X = self.feature_matrix(new_pos + new_neg)
+            Y = np.array(["intent"] * len(new_pos) + ["not-intent"] * len(new_neg))
+            model = copy.deepcopy(self.model)
+            model.partial_fit(X, Y, classes=np.array(["intent", "not-intent"]))
+            self.model = model
+        self._mark_trained()
 
     def score(self, x, y) -> float:
         """
         Evaliates the model using the prepared training data.
         """
         if self.positives and self.negatives and self.model is not None:
-            return self.model.score(x, y)
+            return self.model.score(self._fitted_columns(x), y)
         return 0.0
 
     def predict(self, text: str) -> float:
@@ -141,10 +437,54 @@ class DynamicBinaryClassifier:
         Returns:
             float: The probability of the text being classified as positive.
         """
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Predicts the positive class probability for several texts in a single model call.
+
+        Args:
+            texts (List[str]): The input texts.
+
+        Returns:
+            np.ndarray: The probability of each text being classified as positive.
+        """
+        # queries are open-ended, only training samples are worth memoizing
+        return self.predict_features(self.feature_matrix(texts, cache=False))
+
+    def predict_features(self, X: csr_matrix) -> np.ndarray:
+        """
+        Predicts the positive class probability for already encoded texts.
+
+        Args:
+            X (csr_matrix): Rows encoded with this classifier's vocabulary, wider is fine.
+
+        Returns:
+            np.ndarray: The probability of each row being classified as positive.
+        """
         if self._needs_training:
             self.train()
-        vec = self.one_hot_encode(text)
-        return self.model.predict_proba([vec])[0][0]
+        X = self._fitted_columns(X)
+        probs = self.model.predict_proba(X)[:, 0]
+        # no known token, only the intercept would speak, unknown means not this intent
+        probs[X.getnnz(axis=1) == 0] = 0.0
+        return probs
+
+
+def _first_columns(X: csr_matrix) -> np.ndarray:
+    """Lowest active column of each row, the matrix width for all-zero rows."""
+    first = np.full(X.shape[0], X.shape[1])
+    rows = np.diff(X.indptr) > 0
+    if rows.any():
+        # empty rows hold no entries, each segment ends where the next non-empty row starts
+        first[rows] = np.minimum.reduceat(X.indices, X.indptr[:-1][rows])
+    return first
+
+
+def _fit_model(model: Model, X: csr_matrix, Y: np.ndarray) -> Model:
+    """Fits a model and returns it, process based joblib backends only hand back copies."""
+    model.fit(X, Y)
+    return model
 
 
 class DynamicClassifier:
@@ -152,15 +492,41 @@ class DynamicClassifier:
     A multi-class classifier built on multiple DynamicBinaryClassifiers.
     """
 
-    def __init__(self, instant_train=False):
+    def __init__(self, instant_train=False, n_jobs: Optional[int] = None,
+                 use_multiclass: bool = False, use_hashing: bool = False,
+                 n_features: int = 2 ** 14):
         """
         Initializes the multi-class classifier with an empty label dictionary.
+
+        Args:
+            instant_train (bool): Whether to retrain every time a label is added.
+            n_jobs (Optional[int]): Number of joblib workers used to fit the binary classifiers,
+                -1 uses all cores. None fits them sequentially unless a joblib context says otherwise.
+            use_multiclass (bool): Fit a single multinomial model over all labels instead of one
+                binary classifier per label. Probabilities then sum to 1 across labels.
+            use_hashing (bool): Hash tokens into ``n_features`` fixed columns instead of
+                growing a vocabulary, see :class:`HashingVocabulary`.
+            n_features (int): Feature width in hashing mode.
         """
         self.instant_train = instant_train
+        self.n_jobs = n_jobs
+        self.use_multiclass = use_multiclass
+        # multinomial model and the vocabulary width it was fitted on, only used with use_multiclass
+        self.model: Optional[LogisticRegression] = None
+        self._trained_width: int = 0
+        # stacked weights of the per-label logistic regressions, see _stacked_weights
+        self._stack_key: Optional[tuple] = None
+        self._stack: Optional[Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]] = None
         self._needs_training: bool = True
-        self.clfs: Dict[str, DynamicBinaryClassifier] = defaultdict(DynamicBinaryClassifier)
+        # a single vocabulary for all labels, every sentence is tokenized and encoded once
+        self.vocabulary = HashingVocabulary(n_features) if use_hashing else TokenVocabulary()
+        self.clfs: Dict[str, DynamicBinaryClassifier] = defaultdict(self._make_classifier)
         self.lock = threading.Lock()
 
+    def _make_classifier(self) -> DynamicBinaryClassifier:
+        """Creates a binary classifier sharing this classifier's vocabulary."""
+        return DynamicBinaryClassifier(vocabulary=self.vocabulary)
+
     def add_label(self, name: str, samples: List[str]) -> None:
         """
         Adds a new label with corresponding samples.
@@ -181,6 +547,9 @@ class DynamicClassifier:
     def remove_label(self, name: str):
         if name in self.clfs:
             self.clfs.pop(name)
+            if self.use_multiclass:
+                # the removed label is one of the model classes, refit without it
+                self._needs_training = True
 
     def train(self) -> None:
         """
@@ -188,30 +557,97 @@ class DynamicClassifier:
         """
         with self.lock:
             clfs = dict(self.clfs)  # Copy because it might change during iteration
-            if len(clfs) >= 2:
-                def train_single_label(name: str):
-                    # Add negative samples for the classifier
-                    for name2, other_clf in clfs.items():
-                        if name != name2:
-                            samples = other_clf.positives
-                            self.clfs[name].add_negative([s for s in samples
-                                                          if s not in self.clfs[name].positives
-                                                          and s not in self.clfs[name].negatives])
-                    # Train the classifier
-                    if self.instant_train:
-                        self.clfs[name].train()
-
-                with ThreadPoolExecutor() as executor:
-                    # Submit each classifier training task to the executor
-                    futures = [executor.submit(train_single_label, name) for name in clfs]
-
-                    # Wait for all tasks to complete
-                    for future in futures:
-                        future.result()  # Propagate exceptions if any
-
-                self._needs_training = False
-            else:
+            if len(clfs) < 2:
                 LOG.error("Not enough intents registered, at least 2 needed!")
+                return
+            # cleared before fitting, a label added meanwhile flags a new round
+            self._needs_training = False
+            if self.use_multiclass:
+                self._train_multiclass(clfs)
+            else:
+                for name, clf in clfs.items():
+                    # Add negative samples for the classifier, deduplicated across all other labels
+                    samples = dict.fromkeys(s for name2, other_clf in clfs.items()
+                                            if name != name2
+                                            for s in other_clf.positives)
+                    clf.add_negative([s for s in samples
+                                      if s not in clf._positives_set
+                                      and s not in clf._negatives_set])
+                if self.instant_train:
+                    # models that support it only learn the new samples, the rest refit
+                    for clf in clfs.values():
+                        if clf._needs_training and clf.can_partial_train:
+                            clf.partial_train()
+        if self.instant_train and not self.use_multiclass:
+            self._fit_pending()
+
+    def _train_multiclass(self, clfs: Dict[str, DynamicBinaryClassifier]) -> None:
+        """
+        Fits one multinomial model on the positives of every label, labelled by name.
+
+        Other labels act as the negatives of each class, so no per-label negative sets are built.
+        """
+        X = self.vocabulary.matrix(chain.from_iterable(clf.positives for clf in clfs.values()))
+        Y = np.repeat(np.array(list(clfs)), [len(clf.positives) for clf in clfs.values()])
+        order = np.random.permutation(X.shape[0])
+        X, Y = X[order], Y[order]
+        self.model = LogisticRegression(solver="lbfgs", C=10.0, max_iter=1000)
+        self.model.fit(X, Y)
+        self._trained_width = X.shape[1]
+
+    def _fit_pending(self) -> None:
+        """
+        Fits every classifier that has new samples, in parallel across joblib workers.
+
+        The training matrices are snapshotted under the lock, the fits run without it so labels
+        can be added and predictions served meanwhile, only the model swap re-takes the lock.
+        Fresh copies of the models are fitted, the ones in use are never modified mid-prediction.
+        """
+        tasks = []
+        with self.lock:
+            for clf in self.clfs.values():
+                if clf._needs_training and clf.positives and clf.negatives:
+                    snapshot = clf._snapshot()
+                    X, Y = clf._build_training_arrays()
+                    if clf.model is None:
+                        clf.init_model()
+                    tasks.append((clf, snapshot, X, Y))
+        if not tasks:
+            return
+        models = Parallel(n_jobs=self.n_jobs)(delayed(_fit_model)(clone(clf.model), X, Y)
+                                              for clf, _, X, Y in tasks)
+        with self.lock:
+            for (clf, snapshot, X, _), model in zip(tasks, models):
+                clf.model = model
+                clf._mark_trained(snapshot, X.shape[1])
+
+    def _stacked_weights(self) -> Optional[Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Stacks the coefficients of every trained logistic regression into one (labels, features) matrix.
+
+        Scoring all labels is then a single sparse-dense product instead of one ``predict_proba``
+        per label. Each model is zero padded to the widest fit, which matches slicing off the
+        columns it never saw. Rebuilt whenever any classifier is refitted.
+
+        Returns:
+            Optional[Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]]: Label names, weights,
+                intercepts and fitted widths, None when some label is untrained or not a logistic regression.
+        """
+        clfs = dict(self.clfs)
+        if not clfs or any(clf._needs_training or not isinstance(clf.model, LogisticRegression)
+                          for clf in clfs.values()):
+            return None
+        key = tuple((name, id(clf.model), clf._fit_count) for name, clf in clfs.items())
+        if key != self._stack_key:
+            width = max(clf.model.coef_.shape[1] for clf in clfs.values())
+            W = np.zeros((len(clfs), width))
+            for i, clf in enumerate(clfs.values()):
+                W[i, :clf.model.coef_.shape[1]] = clf.model.coef_[0]
+            b = np.array([clf.model.intercept_[0] for clf in clfs.values()])
+            widths = np.array([clf.model.coef_.shape[1] for clf in clfs.values()])
+            self._stack = (list(clfs), W, b, widths)
+            self._stack_key = key
+        return self._stack
 
     def eval_fp(self):
         # evaluate false positives, via all unified negative samples
@@ -221,21 +657,17 @@ class DynamicClassifier:
                 clf = self.clfs[name]
                 if not clf.positives:
                     continue
-                negatives = []
-                for name2 in [n for n in self.clfs if n != name]:
-                    negatives += self.clfs[name2].positives
-                data: TrainingData = []
+                negatives = dict.fromkeys(s for name2, other_clf in self.clfs.items()
+                                          if name2 != name
+                                          for s in other_clf.positives)
                 # we don't have a training set for positives
                 # but we have a lot of unseen negatives
-                negatives = [n for n in negatives if n not in clf.negatives]
+                negatives = [n for n in negatives if n not in clf._negatives_set]
                 if not negatives:
                     continue
-                for s in clf.positives:
-                    data.append((clf.one_hot_encode(s), "intent"))
-                for s in negatives:
-                    data.append((clf.one_hot_encode(s), "not-intent"))
-                random.shuffle(data)
-                X, Y = zip(*data)
+                # positives are already cached from training, unseen negatives are encoded once
+                X = clf.feature_matrix(clf.positives + negatives, cache=False)
+                Y = np.array(["intent"] * len(clf.positives) + ["not-intent"] * len(negatives))
                 score = clf.score(X, Y)
                 LOG.info(f"TRAINING SCORE: {name}: {score}\n"
                          f"\tN positive samples: {len(clf.positives)}\n"
@@ -251,10 +683,46 @@ class DynamicClassifier:
         Returns:
             Dict[str, float]: A dictionary with label names and their probabilities.
         """
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        """
+        Predicts the probabilities for each label for several texts at once.
+
+        The texts are encoded once with the shared vocabulary and every binary classifier
+        scores the same matrix in a single model call.
+
+        Args:
+            texts (List[str]): The input texts.
+
+        Returns:
+            List[Dict[str, float]]: One label -> probability dictionary per text.
+        """
         if self._needs_training:
             self.train()
+        X = self.vocabulary.matrix(texts, cache=False)
+        if self.use_multiclass:
+            # one call scores every label, columns added after the fit are unknown to the model
+            X = X[:, :self._trained_width]
+            probs = self.model.predict_proba(X)
+            probs[X.getnnz(axis=1) == 0] = 0.0  # no known token, no intent
+            return [dict(zip(self.model.classes_, row)) for row in probs.tolist()]
+        self._fit_pending()
         # self.eval_fp()  # TODO only for debug
-        return {k: clf.predict(text) for k, clf in self.clfs.items()}
+        stack = self._stacked_weights()
+        if stack is not None:
+            names, W, b, widths = stack
+            X = X[:, :W.shape[1]]
+            # decision values are for "not-intent" (classes_[1]), the intent probability is 1 - sigmoid
+            probs = expit(-(X @ W.T + b))
+            # a label scores 0 on rows with no token it was fitted on, see predict_features
+            probs[_first_columns(X)[:, None] >= widths[None, :]] = 0.0
+            return [dict(zip(names, row)) for row in probs.tolist()]
+        preds: List[Dict[str, float]] = [{} for _ in texts]
+        for k, clf in self.clfs.items():
+            for pred, prob in zip(preds, clf.predict_features(X)):
+                pred[k] = prob
+        return preds
 
 
 if __name__ == "__main__":
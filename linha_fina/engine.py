@@ -1,12 +1,19 @@
 import dataclasses
-from collections import defaultdict
-from typing import List, Optional, Dict
+import heapq
+import itertools
+import operator
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Dict, Tuple
 
 from linha_fina.dynamic import DynamicClassifier
 from linha_fina.keywords import KeywordFeatures
 from linha_fina.templates import TemplateMatcher
 
 
+_conf_getter = operator.itemgetter(1)
+
+
 @dataclasses.dataclass
 class IntentMatch:
     name: str
@@ -15,13 +22,58 @@ class IntentMatch:
 
 
 class IntentEngine:
-    def __init__(self, instant_train=False):
-        self.clf = DynamicClassifier(instant_train=instant_train)
-        self.t_matchers: Dict[str, TemplateMatcher] = defaultdict(TemplateMatcher)
-        self.k_matchers: Dict[str, KeywordFeatures] = defaultdict(KeywordFeatures)
+    def __init__(self, instant_train=False, n_jobs: Optional[int] = None,
+                 cache_size: int = 1024):
+        self.clf = DynamicClassifier(instant_train=instant_train, n_jobs=n_jobs)
+        # only intents with templates / entities get a matcher, lookups never create one
+        self.t_matchers: Dict[str, TemplateMatcher] = {}
+        self.k_matchers: Dict[str, KeywordFeatures] = {}
+        # LRU of query -> (best ranked intents, whether every intent is ranked),
+        # cleared whenever the intents change
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[Tuple[IntentMatch, ...], bool]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def clear_cache(self):
+        """Drop every memoized prediction."""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def _cache_get(self, key: str, top_n: int) -> Optional[Tuple[IntentMatch, ...]]:
+        with self._cache_lock:
+            if key in self._cache:
+                results, complete = self._cache[key]
+                # a shorter ranking only answers requests for at most as many intents
+                if complete or len(results) >= top_n:
+                    self._cache.move_to_end(key)
+                    return results
+        return None
+
+    def _cache_put(self, key: str, value: Tuple[IntentMatch, ...], complete: bool):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = (value, complete)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _k_matcher(self, intent: str) -> KeywordFeatures:
+        """The keyword matcher of an intent, created on first registration."""
+        if intent not in self.k_matchers:
+            self.k_matchers[intent] = KeywordFeatures()
+        return self.k_matchers[intent]
 
     def train(self):
         self.clf.train()
+        self.clear_cache()
+
+    def finalize(self):
+        """Build every keyword and template matcher up front, see :meth:`KeywordFeatures.finalize`."""
+        for k_matcher in self.k_matchers.values():
+            k_matcher.finalize()
+        for t_matcher in self.t_matchers.values():
+            t_matcher.finalize()
 
     def register_intent(self, name: str,
                         samples: List[str],
@@ -31,21 +83,33 @@ class IntentEngine:
         entity_samples = entity_samples or {}
         extra_samples = []  # generated from entity + template combos
         if templates:
+            if name not in self.t_matchers:
+                self.t_matchers[name] = TemplateMatcher()
             self.t_matchers[name].add_templates(templates)
-            for ent, e_samples in entity_samples.items():
-                k = "{" + ent + "}"
-                extra_samples += [t.replace(k, s)
-                                  for t in templates for s in e_samples
-                                  if k in t]
+            extra_samples = self._expand_entity_samples(templates, entity_samples)
 
         self.clf.add_label(name, samples + extra_samples)
 
         if entity_samples:
+            k_matcher = self._k_matcher(name)
             for ent, e_samples in entity_samples.items():
-                self.k_matchers[name].register_entity(ent, e_samples)
+                k_matcher.register_entity(ent, e_samples)
+        self.clear_cache()
+
+    @staticmethod
+    def _expand_entity_samples(templates: List[str],
+                               entity_samples: Dict[str, List[str]]) -> List[str]:
+        """Fill each slot of the templates with every sample of its entity, one slot at a time."""
+        # partition once, each template is tested for a placeholder once rather than per sample
+        templates_by_key = {k: [t for t in templates if k in t]
+                            for k in ("{" + ent + "}" for ent in entity_samples)}
+        return [t.replace(k, s)
+                for k, t_list in templates_by_key.items()
+                for t, s in itertools.product(t_list, entity_samples[k[1:-1]])]
 
     def remove_intent(self, name: str):
         self.clf.remove_label(name)
+        self.clear_cache()
 
         if name in self.k_matchers:
             self.k_matchers.pop(name)
@@ -57,12 +121,14 @@ class IntentEngine:
                         intent_name: Optional[str] = None):
         intents = [intent_name] if intent_name else list(self.k_matchers.keys())
         for intent in intents:
-            self.k_matchers[intent].register_entity(name, samples)
+            self._k_matcher(intent).register_entity(name, samples)
+        self.clear_cache()
 
     def remove_entity(self, name: str, intent_name: Optional[str] = None):
         intents = [intent_name] if intent_name else list(self.k_matchers.keys())
         for intent in [i for i in intents if i in self.k_matchers]:
             self.k_matchers[intent].deregister_entity(name)
+        self.clear_cache()
 
     def calc_intent(self, query: str) -> IntentMatch:
         return self.predict(query, top_n=1)[0]
@@ -71,6 +137,10 @@ class IntentEngine:
         """
         Predict the top N intents for a query.
 
+        The ranking is memoized per query until the next registration or train, and
+        serves any request for at most as many intents. Safe to call from several threads
+        at once, the cache and classifier fits are guarded by locks.
+
         Args:
             query (str): The input query.
             top_n (int): Number of top predictions to return.
@@ -78,11 +148,54 @@ class IntentEngine:
         Returns:
             List[IntentMatch]: A list of top N intent matches.
         """
-        preds = self.clf.predict(query)
+        results = self._cache_get(query, top_n)
+        if results is None:
+            preds = self.clf.predict(query)
+            results = tuple(self._rank(query, preds, top_n))
+            self._cache_put(query, results, len(results) == len(preds))
+        return list(results[:top_n])
+
+    def predict_many(self, queries: List[str], top_n: int = 3) -> List[List[IntentMatch]]:
+        """
+        Predict the top N intents for several queries at once.
+
+        The classifier scores all queries in a single batch, only the
+        template and keyword post-processing runs per query.
+
+        Args:
+            queries (List[str]): The input queries.
+            top_n (int): Number of top predictions to return per query.
+
+        Returns:
+            List[List[IntentMatch]]: The top N intent matches for each query.
+        """
+        results = [self._cache_get(query, top_n) for query in queries]
+        misses = list(dict.fromkeys(q for q, r in zip(queries, results) if r is None))
+        if misses:
+            # only queries not memoized yet go through the classifier
+            ranked = {}
+            for query, preds in zip(misses, self.clf.predict_batch(misses)):
+                ranked[query] = tuple(self._rank(query, preds, top_n))
+                self._cache_put(query, ranked[query], len(ranked[query]) == len(preds))
+            results = [r if r is not None else ranked[q] for q, r in zip(queries, results)]
+        return [list(r[:top_n]) for r in results]
+
+    def _rank(self, query: str, preds: Dict[str, float],
+              top_n: Optional[int] = None) -> List[IntentMatch]:
+        """Apply template/keyword boosts to classifier scores and keep the top N, all if None."""
+        if top_n is not None and top_n <= 0:
+            return []
         slots = {}
         results = []
+        partial = top_n is not None and top_n < len(preds)
+        # visit labels by classifier score, so the loop can stop once the top N are settled
+        labels = sorted(preds, key=preds.get, reverse=True) if partial else list(preds)
+        top: List[float] = []  # min-heap of the best N boosted scores so far
 
-        for label in preds:
+        for label in labels:
+            # boosts are at most x1.1, labels below this bound can not reach the top N anymore
+            if partial and len(top) == top_n and top[0] > min(1.0, preds[label] * 1.1):
+                break
             ents = {}
             if label in self.k_matchers:
                 ents = self.k_matchers[label].extract(query)
@@ -100,8 +213,23 @@ class IntentEngine:
                     preds[label] = preds[label] * 0.75
 
             slots[label] = ents
+            if partial:
+                if len(top) < top_n:
+                    heapq.heappush(top, preds[label])
+                elif preds[label] > top[0]:
+                    heapq.heapreplace(top, preds[label])
+
+        if partial:
+            # unvisited labels can't make the cut, rank the rest in their original order for stable ties
+            preds = {label: conf for label, conf in preds.items() if label in slots}
 
-        sorted_preds = sorted(preds.items(), key=lambda x: x[1], reverse=True)[:top_n]
+        if top_n is None or top_n >= len(preds):
+            sorted_preds = sorted(preds.items(), key=_conf_getter, reverse=True)
+        elif top_n == 1:
+            sorted_preds = [max(preds.items(), key=_conf_getter)]
+        else:
+            # O(L log top_n) instead of sorting every label
+            sorted_preds = heapq.nlargest(top_n, preds.items(), key=_conf_getter)
         for label, conf in sorted_preds:
             results.append(IntentMatch(label, slots[label], conf))
         return results
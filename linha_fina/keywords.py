@@ -1,13 +1,40 @@
+import pickle
 import re
-from typing import Tuple, Iterable, Optional, List, Dict
+from typing import Tuple, Iterable, Optional, List, Dict, Set
 
 import joblib
+import numpy as np
 
 try:
     import ahocorasick
 except ImportError:
     ahocorasick = None
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _is_word_char(c: str) -> bool:
+    """
+    Same notion of a word character as the regex ``\\b`` boundary.
+
+    Works on the decoded character on purpose: automaton hit indices count characters,
+    and a byte-level check would treat every non-ASCII letter as a boundary.
+
+    The automaton only asks that the characters around a hit are not word characters, while
+    ``\\b`` asks for a word/non-word change at each edge, so the backends still differ in two ways:
+
+    - a sample ending in a non-word character, like "c++", matches in "c++ x" with the
+      automaton and in "c++x" with the regex
+    - the automaton keys are lowercased, the regex keeps the sample's case, so a mixed-case
+      sample only matches the (lowercased) utterance with the automaton
+    """
+    return c.isalnum() or c == "_"
+
 
 class KeywordFeatures:
     def __init__(self, csv_path: Optional[str] = None,
@@ -19,33 +46,53 @@ class KeywordFeatures:
         Args:
             csv_path (Optional[str]): Path to the CSV file containing entities.
             ignore_list (Optional[List[str]]): List of words to ignore.
-            use_automatons (bool): Whether to use Aho-Corasick automatons for matching.
+            use_automatons (Optional[bool]): Whether to use an Aho-Corasick automaton for matching,
+                None uses it when pyahocorasick is installed.
         """
         if ahocorasick is None and use_automatons:
             raise ImportError("ERROR - pip install pyahocorasick")
-
-        self.ignore_list = ignore_list or []
-        self.use_automatons: bool = use_automatons or False
-        self.automatons: Dict[str, ahocorasick.Automaton] = {}
-        self._needs_building: List[str] = []
+        if use_automatons is None:
+            use_automatons = ahocorasick is not None
+
+        self._ignore_list: frozenset = frozenset(ignore_list or [])
+        self.use_automatons: bool = use_automatons
+        # a single automaton over the samples of every entity, rebuilt on the next match after a change
+        self.automaton: Optional["ahocorasick.Automaton"] = None
+        self._dirty: bool = True
+        # one alternation regex per entity for the regex backend, recompiled lazily when stale
+        self._compiled: Dict[str, Optional[re.Pattern]] = {}
+        self._dirty_re: Set[str] = set()
+        # label -> one-hot column, rebuilt lazily when the entity set changes
+        self._label_index: Optional[Dict[str, int]] = None
         self.entities: Dict[str, List[str]] = {}
         if csv_path:
             self.load_from_csv(csv_path)
 
+    @property
+    def ignore_list(self) -> frozenset:
+        """Values skipped for entities whose name contains ``_name``."""
+        return self._ignore_list
+
+    @ignore_list.setter
+    def ignore_list(self, values: Iterable[str]) -> None:
+        # filters are applied when the matchers are built, rebuild them all
+        self._ignore_list = frozenset(values)
+        self._dirty = True
+        self._dirty_re = set(self.entities)
+
     @property
     def labels(self) -> List[str]:
         """Get sorted list of entity labels."""
         return sorted(list(self.entities.keys()))
 
     def reset(self) -> None:
-        """Reset the automatons and entities."""
-        if self.use_automatons:
-            self._needs_building = [name for name in self.automatons]
-            self.automatons = {name: ahocorasick.Automaton() for name in self.automatons.keys()}
-            for name, samples in self.entities.items():
-                for s in samples:
-                    self.automatons[name].add_word(s.lower(), s)
+        """Reset the automaton and entities."""
         self.entities = {}
+        self.automaton = None
+        self._dirty = True
+        self._label_index = None
+        self._compiled = {}
+        self._dirty_re = set()
 
     def register_entity(self, name: str, samples: List[str]) -> None:
         """Register runtime entity samples.
@@ -57,13 +104,9 @@ class KeywordFeatures:
         if name not in self.entities:
             self.entities[name] = []
         self.entities[name] += samples
-
-        if self.use_automatons:
-            if name not in self.automatons:
-                self.automatons[name] = ahocorasick.Automaton()
-            for s in samples:
-                self.automatons[name].add_word(s.lower(), s)
-            self._needs_building.append(name)
+        self._dirty = True
+        self._label_index = None
+        self._dirty_re.add(name)
 
     def deregister_entity(self, name: str) -> None:
         """Deregister an entity.
@@ -73,10 +116,10 @@ class KeywordFeatures:
         """
         if name in self.entities:
             self.entities.pop(name)
-        if name in self.automatons:
-            self.automatons.pop(name)
-        if name in self._needs_building:
-            self._needs_building.remove(name)
+            self._dirty = True
+            self._label_index = None
+        self._compiled.pop(name, None)
+        self._dirty_re.discard(name)
 
     def load_from_csv(self, csv_path: str) -> Dict[str, List[str]]:
         """Load entities from a CSV file.
@@ -102,17 +145,11 @@ class KeywordFeatures:
             if n not in ents:
                 ents[n] = []
             ents[n].append(s)
-            if self.use_automatons:
-                self._needs_building.append(n)
 
-        if self.use_automatons:
-            for k, samples in ents.items():
-                self._needs_building.append(k)
-                if k not in self.automatons:
-                    self.automatons[k] = ahocorasick.Automaton()
-                for s in samples:
-                    self.automatons[k].add_word(s.lower(), s)
         self.entities.update(ents)
+        self._dirty = True
+        self._label_index = None
+        self._dirty_re.update(ents)
         return ents
 
     def _voc_match(self, utt: str, entity: str) -> Iterable[str]:
@@ -126,50 +163,103 @@ class KeywordFeatures:
         Returns:
             Optional[str]: Longest match if the utterance contains the vocabulary, otherwise None.
         """
-        _vocs = self.entities.get(entity, [])
-        if utt and _vocs:
-            for voc in _vocs:
-                if len(voc) < 3:
-                    continue
-                if "_name" in entity and voc.lower() in self.ignore_list:
-                    continue
-                if re.match(r'.*\b' + re.escape(voc) + r'\b.*', utt):
-                    yield voc
-
-    def _automaton_match(self, utt: str, entity: str) -> Iterable[str]:
+        if not utt or entity not in self.entities:
+            return
+        if entity in self._dirty_re or entity not in self._compiled:
+            self._compile_entity(entity)
+        pattern = self._compiled[entity]
+        if pattern is None:
+            return
+        seen = set()
+        for m in pattern.finditer(utt):
+            voc = m.group(1)
+            if voc not in seen:
+                seen.add(voc)
+                yield voc
+
+    def _compile_entity(self, entity: str) -> None:
         """
-        Determine if the given utterance contains the vocabulary provided using Aho-Corasick automaton.
+        Compiles the samples of an entity into one word-bounded alternation.
+
+        Short samples and ignored names are filtered here, once, and longer samples come first
+        so the longest keyword wins where several start at the same position.
 
         Args:
-            utt (str): Utterance to be tested.
             entity (str): Name of the vocabulary.
-
-        Returns:
-            Optional[str]: Match if the utterance contains the vocabulary, otherwise None.
         """
-        if entity not in self.automatons or entity not in self.entities:
-            # skip automatons without registered samples
-            return None
+        vocs = [voc for voc in dict.fromkeys(self.entities.get(entity, []))
+                if len(voc) >= 3
+                and not ("_name" in entity and voc.lower() in self._ignore_list)]
+        self._compiled[entity] = re.compile(
+            r'\b(' + '|'.join(map(re.escape, sorted(vocs, key=len, reverse=True))) + r')\b'
+        ) if vocs else None
+        self._dirty_re.discard(entity)
+
+    def _build_automaton(self) -> None:
+        """
+        Builds one Aho-Corasick automaton over the samples of all entities.
 
-        automaton = self.automatons[entity]
-        if entity in self._needs_building:
+        Keys are the lowercased samples, the payload is the key and every (entity, sample) pair
+        sharing it, so a single pass over an utterance finds the hits of every entity.
+        """
+        payloads: Dict[str, List[Tuple[str, str]]] = {}
+        for name, samples in self.entities.items():
+            check_ignored = "_name" in name
+            for s in samples:
+                # short and ignored samples can never match, keep them out of the automaton
+                if len(s) < 3:
+                    continue
+                key = s.lower()
+                if check_ignored and key in self._ignore_list:
+                    continue
+                payloads.setdefault(key, []).append((name, s))
+        automaton = ahocorasick.Automaton()
+        for key, pairs in payloads.items():
+            automaton.add_word(key, (key, pairs))
+        if payloads:
             automaton.make_automaton()
-            self._needs_building.remove(entity)
+        self.automaton = automaton
+        self._dirty = False
 
-        try:
-            for idx, v in automaton.iter(utt):
-                if len(v) < 3:
-                    continue
+    def finalize(self) -> None:
+        """
+        Build the matchers now instead of on the first match after a change.
 
-                if "_name" in entity and v.lower() in self.ignore_list:
-                    continue
+        Call once a batch of registrations is done, e.g. when skills finished loading,
+        so the first query doesn't pay for the build. Matching still builds lazily if skipped.
+        """
+        if self.use_automatons:
+            if self._dirty or self.automaton is None:
+                self._build_automaton()
+        else:
+            for entity in self.entities:
+                if entity in self._dirty_re or entity not in self._compiled:
+                    self._compile_entity(entity)
 
-                if v.lower() + " " in utt or utt.endswith(v.lower()):
-                    yield v
-        except AttributeError as e:
-            # print("Not an Aho-Corasick automaton yet, register keywords first")
-            pass
-        return None
+    def _automaton_match(self, utt: str) -> Iterable[Tuple[str, str]]:
+        """
+        Find every registered sample in the utterance with a single Aho-Corasick pass.
+
+        Args:
+            utt (str): Lowercased utterance to be tested.
+
+        Returns:
+            Iterable[Tuple[str, str]]: Matching entities and their values, in utterance order.
+        """
+        if self._dirty or self.automaton is None:
+            self._build_automaton()
+        if self.automaton.kind != ahocorasick.AHOCORASICK:
+            return  # no samples registered
+        n = len(utt)
+        for end, (key, pairs) in self.automaton.iter(utt):
+            start = end - len(key) + 1
+            # whole words only, the hit must not continue a word on either side
+            if start > 0 and _is_word_char(utt[start - 1]):
+                continue
+            if end + 1 < n and _is_word_char(utt[end + 1]):
+                continue
+            # length and ignore_list filters already ran when the automaton was built
+            yield from pairs
 
     def match(self, utt: str) -> Iterable[Tuple[str, str]]:
         """
@@ -181,10 +271,15 @@ class KeywordFeatures:
         Returns:
             Iterable[Tuple[str, str]]: Iterable of matching entities and their values.
         """
+        # normalized once, every entity is matched against the same string
         utt = utt.lower().strip(".!?,;:")
-        for k in list(self.entities):
-            matcher = self._automaton_match(utt, k) if self.use_automatons else self._voc_match(utt, k)
-            for v in matcher:
+        if not utt:
+            return
+        if self.use_automatons:
+            yield from self._automaton_match(utt)
+            return
+        for k in self.entities:
+            for v in self._voc_match(utt, k):
                 yield k, v
 
     def extract(self, sentence: str) -> Dict[str, str]:
@@ -207,16 +302,20 @@ class KeywordFeatures:
         """
         Save the current state to a file.
 
+        The state is pickled, and zstd compressed when ``zstandard`` is installed.
+
         Args:
             file_path (str): Path to the file where the state will be saved.
         """
         data = {
             'entities': self.entities,
-            'automatons': self.automatons,
-            '_needs_building': self._needs_building,
-            'ignore_list': self.ignore_list
+            'ignore_list': sorted(self.ignore_list)
         }
-        joblib.dump(data, file_path)
+        buf = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        if zstandard is not None:
+            buf = zstandard.ZstdCompressor(level=3).compress(buf)
+        with open(file_path, "wb") as f:
+            f.write(buf)
 
     def load(self, file_path: str) -> None:
         """
@@ -225,18 +324,40 @@ class KeywordFeatures:
         Args:
             file_path (str): Path to the file from which the state will be loaded.
         """
-        data = joblib.load(file_path)
+        with open(file_path, "rb") as f:
+            buf = f.read()
+        if buf.startswith(_ZSTD_MAGIC):
+            if zstandard is None:
+                raise ImportError(f"{file_path} is zstd compressed, install zstandard to load it")
+            data = pickle.loads(zstandard.ZstdDecompressor().decompress(buf))
+        else:
+            # plain pickle, or a file written by older versions through joblib
+            data = joblib.load(file_path)
         self.entities = data['entities']
-        self.automatons = data['automatons']
-        self._needs_building = data['_needs_building']
         self.ignore_list = data['ignore_list']
+        # matchers are cheap to rebuild from the entities, they are not persisted
+        self.automaton = None
+        self._dirty = True
+        self._label_index = None
+        self._compiled = {}
+        self._dirty_re = set(self.entities)
+
+    def one_hot_encode(self, text: str) -> np.ndarray:
+        """
+        Encode which entities appear in the text.
+
+        Args:
+            text (str): Text to be encoded.
 
-    def one_hot_encode(self, text):
-        labels = self.labels
-        vec = [0 for _ in labels]
-        for k, v in self.match(text):
-            idx = labels.index(k)
-            vec[idx] = 1
+        Returns:
+            np.ndarray: A uint8 vector with a 1 for every matched entity, in :attr:`labels` order.
+        """
+        if self._label_index is None or len(self._label_index) != len(self.entities):
+            self._label_index = {label: i for i, label in enumerate(self.labels)}
+        idx_map = self._label_index
+        vec = np.zeros(len(idx_map), dtype=np.uint8)
+        for k, _ in self.match(text):
+            vec[idx_map[k]] = 1
         return vec
 
 
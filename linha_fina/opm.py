@@ -2,7 +2,7 @@
 
 from functools import lru_cache
 from os.path import isfile
-from typing import Optional, Dict, List, Union
+from typing import Optional, Dict, List, Tuple, Union
 
 from ovos_bus_client.client import MessageBusClient
 from ovos_bus_client.message import Message
@@ -15,7 +15,7 @@ from ovos_utils.fakebus import FakeBus
 from ovos_utils.log import LOG
 
 from linha_fina.domain_engine import DomainIntentEngine
-from linha_fina.engine import IntentEngine
+from linha_fina.engine import IntentEngine, IntentMatch
 
 
 class LinhaFinaIntent:
@@ -114,6 +114,8 @@ class LinhaFinaPipeline(ConfidenceMatcherPipeline):
         # otherwise training happens on first inference
         for lang in self.containers:
             self.containers[lang].train()
+            # registrations are done, build the keyword matchers once
+            self.containers[lang].finalize()
 
     def _match_level(self, utterances, limit, lang=None,
                      message: Optional[Message] = None) -> Optional[IntentHandlerMatch]:
@@ -231,8 +233,8 @@ class LinhaFinaPipeline(ConfidenceMatcherPipeline):
     def calc_intent(self, utterances: List[str], lang: str = None,
                     message: Optional[Message] = None) -> Optional[LinhaFinaIntent]:
         """
-        Get the best intent match for the given list of utterances. Utilizes a
-        thread pool for overall faster execution. Note that this method is NOT
+        Get the best intent match for the given list of utterances. All of them
+        are scored in one classifier batch for overall faster execution. Note that this method is NOT
         compatible with LinhaFina, but is compatible with LinhaFina.
         @param utterances: list of string utterances to get an intent for
         @param lang: language of utterances
@@ -240,7 +242,7 @@ class LinhaFinaPipeline(ConfidenceMatcherPipeline):
         """
         if isinstance(utterances, str):
             utterances = [utterances]  # backwards compat when arg was a single string
-        utterances = [u for u in utterances if len(u.split()) < self.max_words]
+        utterances = [u for u in utterances if _under_word_limit(u, self.max_words)]
         if not utterances:
             LOG.error(f"utterance exceeds max size of {self.max_words} words, skipping LinhaFina match")
             return None
@@ -254,8 +256,14 @@ class LinhaFinaPipeline(ConfidenceMatcherPipeline):
         sess = SessionManager.get(message)
 
         intent_container = self.containers.get(lang)
-        intents = [_calc_lf_intent(utt, intent_container, sess)
-                   for utt in utterances]
+        try:
+            # all utterance variants go through the classifier in a single batch
+            predictions = intent_container.predict_many(utterances)
+        except Exception as e:
+            LOG.error(e)
+            return None
+        intents = [_select_lf_intent(utt, preds, sess)
+                   for utt, preds in zip(utterances, predictions)]
         intents = [i for i in intents if i is not None]
         # select best
         if intents:
@@ -263,7 +271,7 @@ class LinhaFinaPipeline(ConfidenceMatcherPipeline):
 
     def _get_closest_lang(self, lang: str) -> Optional[str]:
         if self.containers:
-            return closest_lang(lang, list(self.containers.keys()))
+            return _closest_lang_cached(lang, tuple(sorted(self.containers)))
         return None
 
     def shutdown(self):
@@ -273,6 +281,11 @@ class LinhaFinaPipeline(ConfidenceMatcherPipeline):
         self.bus.remove('detach_skill', self.handle_detach_skill)
 
 
+def _under_word_limit(utt: str, max_words: int) -> bool:
+    """``len(utt.split()) < max_words``, without splitting past the limit on long utterances."""
+    return len(utt.split(None, max_words - 1)) < max_words
+
+
 def _split_intent_label(label: str):
     """Split ``skill_id:intent_name`` into ``(skill_id, intent_name)``."""
     if ":" in label:
@@ -335,7 +348,7 @@ class DomainLinhaFinaPipeline(LinhaFinaPipeline):
                     message: Optional[Message] = None) -> Optional[LinhaFinaIntent]:
         if isinstance(utterances, str):
             utterances = [utterances]
-        utterances = [u for u in utterances if len(u.split()) < self.max_words]
+        utterances = [u for u in utterances if _under_word_limit(u, self.max_words)]
         if not utterances:
             return None
         lang = self._get_closest_lang(lang or self.lang)
@@ -359,32 +372,34 @@ class DomainLinhaFinaPipeline(LinhaFinaPipeline):
         return best
 
 
-@lru_cache(maxsize=3)  # repeat calls under different conf levels wont re-run code
-def _calc_lf_intent(utt: str, intent_container: IntentEngine, sess: Session) -> Optional[LinhaFinaIntent]:
+@lru_cache(maxsize=32)  # keyed by the container langs, so a new container misses the cache
+def _closest_lang_cached(lang: str, langs: Tuple[str, ...]) -> Optional[str]:
+    """Memoized ``closest_lang``, the tag distance computation is repeated for every utterance otherwise."""
+    return closest_lang(lang, list(langs))
+
+
+def _select_lf_intent(utt: str, predictions: List[IntentMatch], sess: Session) -> Optional[LinhaFinaIntent]:
     """
-    Try to match an utterance to an intent in an intent_container
+    Pick the best allowed intent out of the engine predictions for an utterance
 
     @return: matched LinhaFinaIntent
     """
-    try:
-        intents = [i for i in intent_container.predict(utt)
-                   if i is not None
-                   and i.conf >= 0.2
-                   and i.name not in sess.blacklisted_intents
-                   and i.name.split(":")[0] not in sess.blacklisted_skills]
-        LOG.debug(f"LinhaFina Intents: {intents}")
-        if len(intents) == 0:
-            return None
-        best_conf = max(x.conf for x in intents)
-        ties = [i for i in intents if i.conf == best_conf]
-
-        # TODO - how to disambiguate ?
-        best_intent = ties[0]
-
-        intent = LinhaFinaIntent(sent=utt,
-                                 name=best_intent.name,
-                                 conf=best_intent.conf,
-                                 matches=best_intent.slots)
-        return intent
-    except Exception as e:
-        LOG.error(e)
+    intents = [i for i in predictions
+               if i is not None
+               and i.conf >= 0.2
+               and i.name not in sess.blacklisted_intents
+               and i.name.split(":")[0] not in sess.blacklisted_skills]
+    LOG.debug(f"LinhaFina Intents: {intents}")
+    if len(intents) == 0:
+        return None
+    best_conf = max(x.conf for x in intents)
+    ties = [i for i in intents if i.conf == best_conf]
+
+    # TODO - how to disambiguate ?
+    best_intent = ties[0]
+
+    intent = LinhaFinaIntent(sent=utt,
+                             name=best_intent.name,
+                             conf=best_intent.conf,
+                             matches=best_intent.slots)
+    return intent
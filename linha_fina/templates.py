@@ -1,24 +1,77 @@
+import heapq
 import itertools
 import re
+import threading
 import warnings
 from collections import defaultdict
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional, Set, Tuple
 
+import numpy as np
 from ovos_spec_tools import expand
-from ovos_utils.log import deprecated
-from rapidfuzz import fuzz
-from simplematch import match as sm
+from ovos_utils.log import LOG, deprecated
+from rapidfuzz import fuzz, process
+from simplematch import Matcher
 
 from linha_fina.version import VERSION_MAJOR
 
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+_RE_SLOT = re.compile(r"\{([^\{\}]+)\}")
+_RE_SLOT_WORD = re.compile(r"\{(\w+)\}")
+# what simplematch treats as a placeholder, slots (typed or not) and wildcards
+_RE_PLACEHOLDER = re.compile(r"\{[^\}]*\}|\*")
+# hyperscan has no capture semantics, simplematch's named groups become plain ones
+_RE_NAMED_GROUP = re.compile(r"\(\?P<\w+>")
+
+
+def _leading_word(template: str) -> Optional[str]:
+    """
+    The literal word every query fitting the template starts with, None if there is none.
+
+    Only a word followed by literal whitespace qualifies, after it the fitting query's first
+    whitespace token is exactly that word. Templates opening with a slot or a word glued to
+    a slot match any first word.
+    """
+    head = _RE_PLACEHOLDER.split(template, 1)[0]
+    word = head.split(None, 1)[0] if head and not head[0].isspace() else ""
+    if word and len(head) > len(word) and head[len(word)].isspace():
+        return word
+    return None
+
 
 class TemplateMatcher:
     """
     Matches text to predefined templates using slot filling and fuzzy matching.
     """
 
-    def __init__(self):
+    def __init__(self, use_hyperscan: Optional[bool] = None):
+        """
+        Initialize the TemplateMatcher class.
+
+        Args:
+            use_hyperscan (Optional[bool]): Whether to find the fitting templates with a single
+                Hyperscan scan, None uses it when hyperscan is installed.
+        """
+        if hyperscan is None and use_hyperscan:
+            raise ImportError("ERROR - pip install hyperscan")
+        if use_hyperscan is None:
+            use_hyperscan = hyperscan is not None
+        self.use_hyperscan: bool = use_hyperscan
         self.templates: Dict[str, List[str]] = defaultdict(list)
+        # (literal text, compiled matcher) once per template, parallel to self.templates
+        self._matchers: Dict[str, List[Tuple[Tuple[str, ...], Matcher]]] = defaultdict(list)
+        # per slot bucket, template indices by the word queries must start with, and the rest
+        self._by_word: Dict[str, Tuple[Dict[str, List[int]], List[int]]] = defaultdict(lambda: ({}, []))
+        # one database over every template and the (slot bucket, index) of each pattern id,
+        # rebuilt on the next match after a change
+        self._database: Optional[Tuple["hyperscan.Database", List[Tuple[str, int]]]] = None
+        self._db_lock = threading.Lock()
+        # a scratch space can only serve one scan at a time, each thread keeps its own
+        self._scratch = threading.local()
+        self._dirty: bool = True
 
     def add_templates(self, templates: List[str]) -> None:
         """
@@ -29,11 +82,88 @@ class TemplateMatcher:
         """
         for template in templates:
             # Extract words within {curly_braces} using regex
-            slots = re.findall(r"\{(\w+)\}", template)
+            slots = _RE_SLOT_WORD.findall(template)
             if not slots:
                 continue
             t_name = slots[0]
             self.templates[t_name].append(template)
+            literals = tuple(part for part in _RE_PLACEHOLDER.split(template) if part)
+            self._matchers[t_name].append((literals, Matcher(template)))
+            by_word, any_word = self._by_word[t_name]
+            idx = len(self.templates[t_name]) - 1
+            word = _leading_word(template)
+            if word is None:
+                any_word.append(idx)
+            else:
+                by_word.setdefault(word, []).append(idx)
+            self._dirty = True
+
+    def _build_database(self) -> None:
+        """
+        Compiles the regex of every template into one Hyperscan database.
+
+        Templates using regex features Hyperscan does not support (typed slots with lookarounds)
+        leave the database unset, and every template is tried in Python instead.
+        """
+        ids, expressions = [], []
+        for ent, matchers in self._matchers.items():
+            for idx, (_, matcher) in enumerate(matchers):
+                ids.append((ent, idx))
+                expressions.append(_RE_NAMED_GROUP.sub("(", matcher.regex).encode("utf-8"))
+        database = None
+        if expressions:
+            flags = hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_ALLOWEMPTY
+            db = hyperscan.Database()
+            try:
+                db.compile(expressions=expressions, ids=list(range(len(expressions))),
+                           elements=len(expressions), flags=[flags] * len(expressions))
+                database = (db, ids)
+            except hyperscan.error as e:
+                LOG.warning(f"templates not supported by hyperscan, matching them one by one: {e}")
+        # scratches are allocated for a given database, drop those of the previous one
+        self._scratch = threading.local()
+        self._database = database
+        self._dirty = False
+
+    def _thread_scratch(self, db: "hyperscan.Database") -> "hyperscan.Scratch":
+        """The calling thread's scratch space for ``db``, allocated on its first scan."""
+        cached = getattr(self._scratch, "scratch", None)
+        if cached is None or cached[0] is not db:
+            cached = (db, hyperscan.Scratch(db))
+            self._scratch.scratch = cached
+        return cached[1]
+
+    def finalize(self) -> None:
+        """
+        Build the Hyperscan database now instead of on the first match after a change.
+        """
+        if self.use_hyperscan and self._dirty:
+            with self._db_lock:
+                if self._dirty:
+                    self._build_database()
+
+    def _candidates(self, query: str) -> Optional[Set[Tuple[str, int]]]:
+        """
+        Templates whose regex fits the query, found with a single Hyperscan scan.
+
+        Returns:
+            Optional[Set[Tuple[str, int]]]: (slot bucket, index) of each fitting template,
+                None when every template has to be tried.
+        """
+        if not self.use_hyperscan or not query:
+            return None
+        self.finalize()
+        database = self._database
+        if database is None:
+            return None
+        db, ids = database
+        hits: Set[Tuple[str, int]] = set()
+
+        def on_match(pattern_id, start, end, flags, context):
+            hits.add(ids[pattern_id])
+
+        db.scan(query.encode("utf-8"), match_event_handler=on_match, scratch=self._thread_scratch(db))
+        return hits
 
     def match(self, query: str) -> List[Dict[str, str]]:
         """
@@ -45,14 +175,37 @@ class TemplateMatcher:
         Returns:
             Slots: A dictionary with matched slots and confidence score.
         """
-        matches = []
+        candidates, matches = [], []
+        fitting = self._candidates(query)
+        first = query.split(None, 1)
+        word = first[0] if first else ""
         for ent, templates in self.templates.items():
-            for t in templates:
-                m = sm(t, query)
+            matchers = self._matchers[ent]
+            by_word, any_word = self._by_word[ent]
+            # only templates that could start like the query, in registration order
+            for idx in heapq.merge(by_word.get(word, ()), any_word):
+                t, (literals, matcher) = templates[idx], matchers[idx]
+                if fitting is not None:
+                    if (ent, idx) not in fitting:
+                        continue
+                # every literal chunk must appear verbatim, cheaper to rule out than the regex
+                elif not all(part in query for part in literals):
+                    continue
+                m = matcher.match(query)
                 if m:
-                    s = fuzz.token_set_ratio(t, query)
-                    matches.append((s, m))
-        matches = sorted(matches, key=lambda k: k[0], reverse=True)
+                    candidates.append(t)
+                    matches.append(m)
+        unique = list(dict.fromkeys(candidates))
+        if len(unique) < 2:
+            # nothing to rank, skip the fuzzy scoring
+            return matches
+        # fuzzy score every distinct slot-filling template in a single call
+        scores = process.cdist([query], unique, scorer=fuzz.token_set_ratio,
+                               dtype=np.float64)[0].tolist()
+        if len(unique) < len(candidates):
+            by_template = dict(zip(unique, scores))
+            scores = [by_template[t] for t in candidates]
+        matches = sorted(zip(scores, matches), key=lambda k: k[0], reverse=True)
         return [m[1] for m in matches]
 
 
@@ -65,40 +218,50 @@ def expand_template(template: str) -> list[str]:
         DeprecationWarning,
         stacklevel=2,
     )
-    return sorted(set(expand(template)))
+    # expand already yields distinct samples, only the legacy sort order is left to apply
+    return sorted(expand(template))
 
 
-def expand_slots(template: str, slots: dict[str, list[str]]) -> list[str]:
-    """Expand a template by first expanding alternatives and optional components,
+def iter_expand_slots(template: str, slots: dict[str, list[str]]) -> Iterator[str]:
+    """Lazily expand a template by first expanding alternatives and optional components,
     then substituting slot placeholders with their corresponding options.
 
+    Expansions are yielded one at a time, the slot combinations are never held in memory at once.
+
     Args:
         template (str): The input string template to expand.
         slots (dict): A dictionary where keys are slot names and values are lists of possible replacements.
 
-    Returns:
-        list[str]: A list of all expanded combinations.
+    Yields:
+        str: Each expanded combination.
     """
     # Expand alternatives and optional components
-    base_expansions = expand(template)
-
-    # Process slots
-    all_sentences = []
-    for sentence in base_expansions:
-        matches = re.findall(r"\{([^\{\}]+)\}", sentence)
-        if matches:
-            # Create all combinations for slots in the sentence
-            slot_options = [slots.get(match, [f"{{{match}}}"]) for match in matches]
-            for combination in itertools.product(*slot_options):
-                filled_sentence = sentence
-                for slot, replacement in zip(matches, combination):
-                    filled_sentence = filled_sentence.replace(f"{{{slot}}}", replacement)
-                all_sentences.append(filled_sentence)
+    for sentence in expand(template):
+        # literal text at even indices, slot names at odd ones
+        parts = _RE_SLOT.split(sentence)
+        if len(parts) > 1:
+            # Create all combinations for slots in the sentence, each one is a single join
+            options = [slots.get(part, [f"{{{part}}}"]) if i % 2 else [part]
+                       for i, part in enumerate(parts)]
+            for combination in itertools.product(*options):
+                yield "".join(combination)
         else:
             # No slots to expand
-            all_sentences.append(sentence)
+            yield sentence
 
-    return all_sentences
+
+def expand_slots(template: str, slots: dict[str, list[str]]) -> list[str]:
+    """Expand a template by first expanding alternatives and optional components,
+    then substituting slot placeholders with their corresponding options.
+
+    Args:
+        template (str): The input string template to expand.
+        slots (dict): A dictionary where keys are slot names and values are lists of possible replacements.
+
+    Returns:
+        list[str]: A list of all expanded combinations.
+    """
+    return list(iter_expand_slots(template, slots))
 
 
 if __name__ == "__main__":
@@ -15,9 +15,8 @@ class TestDynamicBinaryClassifier:
     def test_add_positive_registers_tokens_as_features(self):
         clf = DynamicBinaryClassifier()
         clf.add_positive(["play africa"])
-        # Each token becomes an entity for the featurizer
-        assert "play" in clf.featurizer.entities
-        assert "africa" in clf.featurizer.entities
+        # Each token gets a feature column
+        assert set(clf.vocabulary.columns) == {"play", "africa"}
 
     def test_add_negative_caps_at_3x_positives(self):
         clf = DynamicBinaryClassifier()
@@ -26,6 +25,28 @@ class TestDynamicBinaryClassifier:
         clf.add_negative([f"neg{i}" for i in range(10)])
         assert len(clf.negatives) <= 3
 
+    def test_add_negative_keeps_least_similar(self):
+        clf = DynamicBinaryClassifier()
+        clf.add_positive(["play music"])
+        clf.add_negative(["play music now", "stop", "play some music",
+                          "be quiet", "play music loud", "shut up"])
+        assert len(clf.negatives) == 3
+        assert set(clf.negatives) == {"stop", "be quiet", "shut up"}
+
+    def test_add_negative_under_cap_skips_scoring(self):
+        clf = DynamicBinaryClassifier()
+        clf.add_positive(["play music", "play song"])
+        clf.add_negative(["stop", "pause"])
+        assert clf.negatives == ["stop", "pause"]
+        assert clf._neg_scores == {}
+
+    def test_add_negative_before_positive_is_scored_later(self):
+        clf = DynamicBinaryClassifier()
+        clf.add_negative(["a", "b", "c", "d"])
+        clf.add_positive(["one"])
+        clf.add_negative(["e"])
+        assert len(clf.negatives) == 3
+
     def test_one_hot_encode_returns_vector(self):
         clf = DynamicBinaryClassifier()
         clf.add_positive(["alpha beta"])
@@ -33,6 +54,62 @@ class TestDynamicBinaryClassifier:
         assert isinstance(vec, list)
         assert sum(vec) >= 1
 
+    def test_token_columns_are_stable_and_case_insensitive(self):
+        clf = DynamicBinaryClassifier()
+        clf.add_positive(["Play music"])
+        before = clf.one_hot_encode("play music")
+        clf.add_positive(["stop now"])
+        after = clf.one_hot_encode("play music")
+        # existing columns keep their position, new tokens are appended
+        assert after[:len(before)] == before == [1, 1]
+        assert after[len(before):] == [0, 0]
+
+    def test_short_tokens_carry_no_feature(self):
+        clf = DynamicBinaryClassifier()
+        clf.add_positive(["tell me a joke"])
+        assert sorted(clf.vocabulary.columns) == ["joke", "tell"]
+        assert clf.one_hot_encode("is it me") == [0, 0]
+
+    def test_only_short_tokens_still_trains(self):
+        clf = DynamicBinaryClassifier()
+        clf.add_positive(["a b", "a c"])
+        clf.add_negative(["x y", "x z"])
+        # no token gets a column, the matrix keeps one empty padding column
+        assert len(clf.vocabulary) == 0
+        assert clf.feature_matrix(["a b"]).shape == (1, 1)
+        clf.train()
+        assert 0.0 <= clf.predict("a b") <= 1.0
+
+    def test_encode_cache_invalidated_on_new_vocabulary(self):
+        clf = DynamicBinaryClassifier()
+        clf.add_positive(["alpha beta"])
+        assert sum(clf.one_hot_encode("alpha gamma")) == 1
+        assert "alpha gamma" in clf.vocabulary._cache
+        clf.add_positive(["gamma delta"])
+        # new tokens change the vocabulary, stale encodings must not be reused
+        assert sum(clf.one_hot_encode("alpha gamma")) == 2
+
+    def test_positives_are_tokenized_once(self, monkeypatch):
+        from linha_fina import dynamic
+        calls = []
+        original = dynamic.word_tokenize
+        monkeypatch.setattr(dynamic, "word_tokenize", lambda text: calls.append(text) or original(text))
+        clf = DynamicBinaryClassifier()
+        clf.add_positive(["play music"])
+        clf.one_hot_encode("play music")
+        clf.add_positive(["stop now"])
+        # the vocabulary changed, the encoding is redone from the cached tokens
+        clf.one_hot_encode("play music")
+        assert calls == ["play music", "stop now"]
+
+    def test_query_token_cache_is_bounded(self):
+        clf = DynamicBinaryClassifier()
+        clf.vocabulary.query_cache_size = 2
+        clf.add_positive(["play music"])
+        clf.feature_matrix(["one", "two", "three"], cache=False)
+        assert list(clf.vocabulary._query_tokens) == ["two", "three"]
+        assert "play music" in clf.vocabulary._tokens
+
     def test_training_data_combines_positives_and_negatives(self):
         clf = DynamicBinaryClassifier()
         clf.add_positive(["yes one", "yes two"])
@@ -41,6 +118,16 @@ class TestDynamicBinaryClassifier:
         labels = {label for _, label in data}
         assert labels == {"intent", "not-intent"}
 
+    def test_training_arrays_keep_rows_aligned_with_labels(self):
+        clf = DynamicBinaryClassifier()
+        clf.add_positive(["yes one", "yes two", "yes three"])
+        clf.add_negative(["no one", "no two"])
+        X, Y = clf._build_training_arrays()
+        assert X.shape == (5, len(clf.vocabulary))
+        yes = clf.vocabulary.columns["yes"]
+        # shuffling permutes rows and labels together
+        assert (X[:, yes].toarray().ravel() == 1).tolist() == (Y == "intent").tolist()
+
     def test_train_and_predict(self):
         clf = DynamicBinaryClassifier()
         clf.add_positive(["play music", "play song", "play track"])
@@ -60,6 +147,64 @@ class TestDynamicBinaryClassifier:
         assert 0.0 <= conf <= 1.0
         assert clf._needs_training is False
 
+    def test_predict_batch_matches_single_predict(self):
+        clf = DynamicBinaryClassifier()
+        clf.add_positive(["play music", "play song", "play track"])
+        clf.add_negative(["stop now", "be quiet", "shut up"])
+        texts = ["play song now", "be quiet"]
+        batch = clf.predict_batch(texts)
+        assert len(batch) == 2
+        for text, conf in zip(texts, batch):
+            assert conf == pytest.approx(clf.predict(text), rel=1e-4)
+
+    def test_partial_train_feeds_only_new_samples(self, monkeypatch):
+        from sklearn.linear_model import SGDClassifier
+        clf = DynamicBinaryClassifier()
+        clf.init_model(SGDClassifier(loss="log_loss", random_state=0))
+        clf.add_positive(["play music", "play song", "play track"])
+        clf.add_negative(["stop now", "be quiet"])
+        clf.train()
+        model = clf.model
+        coef = model.coef_.copy()
+        seen = []
+        original = SGDClassifier.partial_fit
+        monkeypatch.setattr(SGDClassifier, "partial_fit",
+                            lambda self, X, Y, classes: seen.append(list(Y)) or original(self, X, Y, classes=classes))
+        clf.add_negative(["shut up"])
+        assert clf.can_partial_train
+        clf.partial_train()
+        assert seen == [["not-intent"]]
+        assert clf._needs_training is False
+        # the update lands on a copy, the model that was serving predictions is left untouched
+        assert clf.model is not model
+        assert (model.coef_ == coef).all()
+
+    def test_partial_train_refits_when_vocabulary_changes(self):
+        from sklearn.linear_model import SGDClassifier
+        clf = DynamicBinaryClassifier()
+        clf.init_model(SGDClassifier(loss="log_loss", random_state=0))
+        clf.add_positive(["play music", "play song"])
+        clf.add_negative(["stop now", "be quiet"])
+        clf.train()
+        clf.add_positive(["put on wonderwall"])
+        # new tokens change the feature columns, an in-place update is impossible
+        assert not clf.can_partial_train
+        clf.partial_train()
+        assert clf._needs_training is False
+        assert 0.0 <= clf.predict("put on wonderwall") <= 1.0
+
+    def test_hashing_mode_has_fixed_width(self):
+        clf = DynamicBinaryClassifier(use_hashing=True, n_features=64)
+        clf.add_positive(["play music", "play song"])
+        clf.add_negative(["stop now", "be quiet"])
+        assert len(clf.one_hot_encode("play music")) == 64
+        # nothing is registered, unseen tokens still get a column
+        assert clf.vocabulary.columns == {}
+        assert sum(clf.one_hot_encode("completely unseen")) >= 1
+        clf.add_positive(["put on wonderwall"])
+        assert clf.feature_matrix(["put on wonderwall"]).shape == (1, 64)
+        assert 0.0 <= clf.predict("play song") <= 1.0
+
     def test_train_without_data_is_noop(self):
         clf = DynamicBinaryClassifier()
         clf.train()
@@ -113,6 +258,18 @@ class TestDynamicClassifier:
         for v in scores.values():
             assert 0.0 <= v <= 1.0
 
+    def test_predict_batch_returns_one_dict_per_text(self):
+        clf = DynamicClassifier()
+        clf.add_label("greet", ["hello", "hi there", "hey"])
+        clf.add_label("bye", ["goodbye", "see you", "bye"])
+        clf.add_label("thanks", ["thanks", "thank you", "much appreciated"])
+        clf.train()
+        texts = ["hello", "thank you"]
+        batch = clf.predict_batch(texts)
+        assert len(batch) == 2
+        for text, scores in zip(texts, batch):
+            assert scores == pytest.approx(clf.predict(text), rel=1e-4)
+
     def test_predict_intended_intent_wins(self):
         clf = DynamicClassifier()
         clf.add_label("greet", ["hello", "hi there", "hey", "good morning"])
@@ -132,6 +289,130 @@ class TestDynamicClassifier:
         # After 3 labels, instant_train should have produced models
         assert clf._needs_training is False
 
+    def test_eval_fp_scores_unseen_negatives(self, monkeypatch):
+        import linha_fina.dynamic as dynamic
+        logged = []
+        monkeypatch.setattr(dynamic.LOG, "info", logged.append)
+        clf = DynamicClassifier()
+        clf.add_label("greet", ["hello", "hi there", "hey"])
+        clf.add_label("bye", ["goodbye", "see you", "bye"])
+        clf.add_label("thanks", ["thanks", "thank you", "much appreciated"])
+        clf.add_label("music", ["play music", "play a song", "music please", "some tunes",
+                                "put on music", "play the radio", "turn on music", "songs"])
+        clf.predict("hello")
+        clf.eval_fp()
+        # "music" has more positives than the 3x negative cap of the others
+        assert any(msg.startswith("TRAINING SCORE: greet") for msg in logged)
+
+    def test_parallel_fit_with_joblib_workers(self):
+        clf = DynamicClassifier(n_jobs=2)
+        clf.add_label("greet", ["hello", "hi there", "hey", "good morning"])
+        clf.add_label("bye", ["goodbye", "see you", "bye", "later"])
+        clf.add_label("thanks", ["thanks", "thank you", "much appreciated"])
+        scores = clf.predict("hello there")
+        # models fitted in worker processes are assigned back to their classifier
+        assert all(not c._needs_training and c.model is not None for c in clf.clfs.values())
+        assert max(scores, key=scores.get) == "greet"
+
+    def test_stacked_weights_match_per_label_predictions(self):
+        clf = DynamicClassifier()
+        clf.add_label("greet", ["hello", "hi there", "hey"])
+        clf.add_label("bye", ["goodbye", "see you", "bye"])
+        clf.add_label("thanks", ["thanks", "thank you", "much appreciated"])
+        texts = ["hello there", "thank you so much"]
+        batch = clf.predict_batch(texts)
+        assert clf._stack is not None
+        for text, scores in zip(texts, batch):
+            for name, c in clf.clfs.items():
+                assert scores[name] == pytest.approx(c.predict(text), rel=1e-6)
+
+    def test_unknown_words_score_zero(self):
+        clf = DynamicClassifier()
+        clf.add_label("greet", ["hello", "hi there", "hey"])
+        clf.add_label("bye", ["goodbye", "see you", "bye"])
+        clf.add_label("thanks", ["thanks", "thank you", "much appreciated"])
+        stacked = clf.predict_batch(["asdf qwer", "xyzzy"])
+        assert clf._stack is not None
+        assert stacked == [{"greet": 0.0, "bye": 0.0, "thanks": 0.0}] * 2
+        # the per-label path agrees with the stacked one
+        assert all(c.predict("asdf qwer") == 0.0 for c in clf.clfs.values())
+
+    def test_stacked_weights_rebuilt_after_refit(self):
+        clf = DynamicClassifier()
+        clf.add_label("greet", ["hello", "hi there", "hey"])
+        clf.add_label("bye", ["goodbye", "see you", "bye"])
+        clf.predict("hello")
+        stack = clf._stack
+        clf.add_label("thanks", ["thanks", "thank you"])
+        scores = clf.predict("thank you")
+        assert clf._stack is not stack
+        assert set(scores) == {"greet", "bye", "thanks"}
+
+    def test_fit_runs_outside_lock_and_keeps_concurrent_samples(self, monkeypatch):
+        from linha_fina import dynamic
+        clf = DynamicClassifier()
+        clf.add_label("greet", ["hello", "hi there", "hey"])
+        clf.add_label("bye", ["goodbye", "see you", "bye"])
+        clf.train()
+        original = dynamic._fit_model
+        added = []
+
+        def fit_while_adding(model, X, Y):
+            assert not clf.lock.locked()
+            if not added:
+                added.append(True)
+                clf.clfs["greet"].add_positive(["good morning"])
+            return original(model, X, Y)
+
+        monkeypatch.setattr(dynamic, "_fit_model", fit_while_adding)
+        clf._fit_pending()
+        # the sample arrived after the snapshot, its classifier stays pending
+        assert clf.clfs["greet"]._needs_training is True
+        assert clf.clfs["bye"]._needs_training is False
+        clf._fit_pending()
+        assert clf.clfs["greet"]._needs_training is False
+
+    def test_labels_share_one_vocabulary(self):
+        clf = DynamicClassifier()
+        clf.add_label("greet", ["hello there"])
+        clf.add_label("bye", ["goodbye now"])
+        greet, bye = clf.clfs["greet"], clf.clfs["bye"]
+        assert greet.vocabulary is bye.vocabulary is clf.vocabulary
+        assert set(clf.vocabulary.columns) == {"hello", "there", "goodbye", "now"}
+
+    def test_predict_still_works_after_vocabulary_grows(self):
+        clf = DynamicClassifier()
+        clf.add_label("greet", ["hello", "hi there", "hey"])
+        clf.add_label("bye", ["goodbye", "see you", "bye"])
+        clf.train()
+        clf.predict("hello")
+        # a new label widens the shared vocabulary, fitted models ignore the extra columns
+        clf.add_label("thanks", ["thanks a lot", "thank you"])
+        clf.clfs["greet"]._needs_training = False
+        scores = clf.clfs["greet"].predict_batch(["hello", "thank you"])
+        assert len(scores) == 2
+
+    def test_multiclass_mode_fits_single_model(self):
+        clf = DynamicClassifier(use_multiclass=True)
+        clf.add_label("greet", ["hello", "hi there", "hey", "good morning"])
+        clf.add_label("bye", ["goodbye", "see you", "bye", "later"])
+        clf.add_label("thanks", ["thanks", "thank you", "much appreciated"])
+        scores = clf.predict("hello there")
+        assert set(scores) == {"greet", "bye", "thanks"}
+        assert sum(scores.values()) == pytest.approx(1.0)
+        assert max(scores, key=scores.get) == "greet"
+        # no per-label models or negatives are built
+        assert all(c.model is None and not c.negatives for c in clf.clfs.values())
+
+    def test_multiclass_mode_refits_after_remove(self):
+        clf = DynamicClassifier(use_multiclass=True)
+        clf.add_label("greet", ["hello", "hi there", "hey"])
+        clf.add_label("bye", ["goodbye", "see you", "bye"])
+        clf.add_label("thanks", ["thanks", "thank you"])
+        clf.predict("hello")
+        clf.remove_label("thanks")
+        assert set(clf.predict("thank you")) == {"greet", "bye"}
+
     def test_predict_after_remove_drops_label(self):
         clf = DynamicClassifier()
         clf.add_label("greet", ["hello", "hi", "hey"])
@@ -29,6 +29,22 @@ def slot_engine():
     return e
 
 
+@pytest.fixture(scope="module")
+def demo_engine():
+    # the engine module's __main__ demo
+    e = IntentEngine()
+    e.register_intent("hello", ["hello world", "hey there", "hello"])
+    e.register_intent("joke", ["tell me a joke", "say a joke", "make me laugh"])
+    e.register_intent("weather", ["how is the weather", "what's the weather like",
+                                  "what is the weather outside"])
+    e.register_intent("introduce", ["my name is {name}", "call me {name}"])
+    e.register_intent("color", ["change the color to {color}", "change light to {color}",
+                                "set light to {color}}"],
+                      entity_samples={"color": ["red", "green", "blue"]})
+    e.train()
+    return e
+
+
 class TestRegistration:
     def test_register_intent_creates_classifier(self):
         e = IntentEngine()
@@ -52,6 +68,11 @@ class TestRegistration:
         assert "greet" not in e.t_matchers
         assert "greet" not in e.k_matchers
 
+    def test_predict_does_not_create_matchers(self, engine):
+        engine.predict("hello there")
+        assert engine.t_matchers == {}
+        assert engine.k_matchers == {}
+
     def test_register_intent_expands_entity_samples_into_training(self):
         e = IntentEngine()
         e.register_intent(
@@ -65,6 +86,17 @@ class TestRegistration:
         assert "play africa" in positives
         assert "play hey jude" in positives
 
+    def test_entity_samples_only_expand_templates_with_the_slot(self):
+        e = IntentEngine()
+        e.register_intent(
+            "play",
+            ["play {song}", "play something by {artist}"],
+            entity_samples={"song": ["africa"], "artist": ["toto"]},
+        )
+        positives = e.clf.clfs["play"].positives
+        assert positives == ["play {song}", "play something by {artist}",
+                             "play africa", "play something by toto"]
+
     def test_remove_intent_cleans_all(self, slot_engine):
         slot_engine.remove_intent("play")
         assert "play" not in slot_engine.clf.clfs
@@ -110,6 +142,29 @@ class TestPrediction:
         assert engine.calc_intent("goodbye").name == "bye"
         assert engine.calc_intent("thank you").name == "thanks"
 
+    @pytest.mark.parametrize("query,label", [
+        ("hello earth", "hello"),
+        ("call me Casimiro", "introduce"),
+        ("my name is Miro", "introduce"),
+        ("tell me a joke", "joke"),
+        ("what is the weather", "weather"),
+        ("tell me a joke about the weather", "joke"),
+        ("red blue and green are my 3 favorite colors", "color"),
+        ("red is my favorite color", "color"),
+        ("light to blue", "color"),
+        ("change to green", "color"),
+        ("make color green", "color"),
+    ])
+    def test_demo_predictions(self, demo_engine, query, label):
+        assert demo_engine.calc_intent(query).name == label
+
+    @pytest.mark.parametrize("top_n", [0, -1])
+    def test_non_positive_top_n_returns_nothing(self, engine, top_n):
+        assert engine.predict("hello", top_n=top_n) == []
+        assert engine.predict_many(["hello", "goodbye"], top_n=top_n) == [[], []]
+        # the empty ranking is not served to a later, larger request
+        assert len(engine.predict("hello", top_n=3)) == 3
+
     def test_predict_returns_top_n(self, engine):
         results = engine.predict("hello", top_n=2)
         assert len(results) == 2
@@ -120,11 +175,84 @@ class TestPrediction:
         confs = [r.conf for r in results]
         assert confs == sorted(confs, reverse=True)
 
+    def test_predict_many_matches_predict(self, engine):
+        queries = ["hello there", "goodbye", "thank you"]
+        batch = engine.predict_many(queries, top_n=2)
+        assert len(batch) == len(queries)
+        for query, results in zip(queries, batch):
+            single = engine.predict(query, top_n=2)
+            assert [r.name for r in results] == [r.name for r in single]
+            assert [r.conf for r in results] == pytest.approx([r.conf for r in single], rel=1e-4)
+
     def test_confidence_in_valid_range(self, engine):
         for r in engine.predict("hello there", top_n=3):
             assert 0.0 <= r.conf <= 1.0
 
 
+class TestPredictionCache:
+    def test_repeated_query_skips_classifier(self, engine, monkeypatch):
+        first = engine.predict("hello there")
+        monkeypatch.setattr(engine.clf, "predict", lambda q: pytest.fail("cache miss"))
+        assert engine.predict("hello there") == first
+
+    def test_predict_many_reuses_cached_queries(self, engine, monkeypatch):
+        engine.predict("hello there")
+        seen = []
+        original = engine.clf.predict_batch
+        monkeypatch.setattr(engine.clf, "predict_batch", lambda qs: seen.extend(qs) or original(qs))
+        engine.predict_many(["hello there", "goodbye"])
+        assert seen == ["goodbye"]
+
+    def test_different_top_n_share_one_entry(self, engine, monkeypatch):
+        full = engine.predict("hello there", top_n=3)
+        monkeypatch.setattr(engine.clf, "predict", lambda q: pytest.fail("cache miss"))
+        assert engine.predict("hello there", top_n=1) == full[:1]
+        assert engine.calc_intent("hello there") == full[0]
+        assert list(engine._cache) == ["hello there"]
+
+    def test_shorter_ranking_recomputed_for_larger_top_n(self, engine):
+        best = engine.predict("hello there", top_n=1)
+        full = engine.predict("hello there", top_n=3)
+        assert len(full) == 3
+        assert full[0] == best[0]
+        assert [m.conf for m in full] == sorted((m.conf for m in full), reverse=True)
+
+    def test_top_n_ranking_matches_full_sort(self):
+        e = IntentEngine(cache_size=0)
+        for i, name in enumerate(["a", "b", "c", "d", "e"]):
+            e.register_intent(name, [f"word{i} thing{i}", f"word{i}", f"thing{i} stuff"])
+        full = e.predict("word1 thing3", top_n=5)
+        assert e.predict("word1 thing3", top_n=2) == full[:2]
+        assert e.predict("word1 thing3", top_n=1) == full[:1]
+
+    def test_top_n_skips_matchers_of_hopeless_labels(self, engine, monkeypatch):
+        engine.register_intent("play", ["play {song}", "put on {song}"],
+                               entity_samples={"song": ["africa", "hey jude"]})
+        full = engine.predict("hello there", top_n=4)
+        scores = engine.clf.predict("hello there")
+        assert full[0].name == "greet"
+        assert scores["play"] * 1.1 < full[0].conf
+        engine.clear_cache()
+        monkeypatch.setattr(engine.t_matchers["play"], "match",
+                            lambda q: pytest.fail("template matched for a hopeless label"))
+        assert engine.predict("hello there", top_n=1) == full[:1]
+
+    def test_registration_invalidates_cache(self, engine):
+        engine.predict("play africa")
+        engine.register_intent("play", ["play {song}", "put on {song}"],
+                               entity_samples={"song": ["africa"]})
+        assert engine.predict("play africa")[0].name == "play"
+
+    def test_cache_bounded_by_size(self):
+        e = IntentEngine(cache_size=2)
+        e.register_intent("greet", ["hello", "hi there", "hey"])
+        e.register_intent("bye", ["goodbye", "see you", "bye"])
+        e.register_intent("thanks", ["thanks", "thank you", "much appreciated"])
+        for q in ["hello", "goodbye", "thanks"]:
+            e.predict(q)
+        assert len(e._cache) == 2
+
+
 class TestSlotExtraction:
     def test_template_match_extracts_slot(self, slot_engine):
         m = slot_engine.calc_intent("play africa")
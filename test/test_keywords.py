@@ -1,8 +1,11 @@
 """Tests for linha_fina.keywords."""
 
 import os
+import pickle
 import tempfile
 
+import joblib
+import numpy as np
 import pytest
 
 from linha_fina.keywords import KeywordFeatures
@@ -94,6 +97,9 @@ class TestMatching:
     def test_no_match_returns_empty_dict(self, kw):
         assert kw.extract("xyzzy plugh") == {}
 
+    def test_punctuation_only_matches_nothing(self, kw):
+        assert kw.extract("?!") == {}
+
 
 class TestIgnoreList:
     def test_ignored_value_skipped_for_name_entities(self):
@@ -105,6 +111,17 @@ class TestIgnoreList:
         result2 = k.extract("hello bob")
         assert result2 == {"first_name": "bob"}
 
+    def test_ignore_list_is_frozenset(self):
+        k = KeywordFeatures(ignore_list=["alice", "alice"])
+        assert k.ignore_list == frozenset({"alice"})
+
+    def test_changing_ignore_list_rebuilds_matchers(self):
+        k = KeywordFeatures()
+        k.register_entity("first_name", ["alice", "bob"])
+        assert k.extract("hello alice") == {"first_name": "alice"}
+        k.ignore_list = ["alice"]
+        assert k.extract("hello alice") == {}
+
     def test_ignore_list_only_applies_to_name_entities(self):
         k = KeywordFeatures(ignore_list=["alice"])
         k.register_entity("person", ["alice", "bob"])
@@ -125,7 +142,19 @@ class TestOneHotEncode:
         assert vec[labels.index("color")] == 1
 
     def test_no_match_all_zeros(self, kw):
-        assert kw.one_hot_encode("xyzzy") == [0] * len(kw.labels)
+        assert kw.one_hot_encode("xyzzy").tolist() == [0] * len(kw.labels)
+
+    def test_returns_uint8_array(self, kw):
+        vec = kw.one_hot_encode("red apple")
+        assert vec.dtype == np.uint8
+        assert vec.tolist() == [1, 1]
+
+    def test_columns_follow_new_entities(self, kw):
+        kw.one_hot_encode("red")
+        kw.register_entity("animal", ["cat"])
+        vec = kw.one_hot_encode("red cat")
+        assert len(vec) == 3
+        assert vec[kw.labels.index("animal")] == 1
 
     def test_partial_match(self, kw):
         vec = kw.one_hot_encode("a green thing")
@@ -145,6 +174,23 @@ class TestPersistence:
         assert restored.entities == kw.entities
         assert restored.extract("a red apple") == kw.extract("a red apple")
 
+    def test_load_legacy_joblib_file(self, kw, tmp_path):
+        path = tmp_path / "kw.pkl"
+        joblib.dump({"entities": kw.entities, "ignore_list": []}, str(path))
+
+        restored = KeywordFeatures()
+        restored.load(str(path))
+
+        assert restored.entities == kw.entities
+
+    def test_saves_plain_pickle_without_zstandard(self, kw, tmp_path, monkeypatch):
+        monkeypatch.setattr("linha_fina.keywords.zstandard", None)
+        path = tmp_path / "kw.pkl"
+        kw.save(str(path))
+
+        with open(path, "rb") as f:
+            assert pickle.load(f)["entities"] == kw.entities
+
 
 class TestCsvLoad:
     def test_load_from_csv(self, tmp_path):
@@ -159,6 +205,41 @@ class TestCsvLoad:
         assert "red" in k.entities["color"]
 
 
+class TestRegexBackend:
+    def test_extract_matches_whole_words(self):
+        k = KeywordFeatures(use_automatons=False)
+        k.register_entity("fruit", ["apple", "banana"])
+        k.register_entity("animal", ["cat"])
+        assert sorted(k.match("a banana and an apple")) == [("fruit", "apple"), ("fruit", "banana")]
+        assert k.extract("concatenate this") == {}
+        assert k.extract("the cat sleeps") == {"animal": "cat"}
+
+    def test_longest_alternative_wins(self):
+        k = KeywordFeatures(use_automatons=False)
+        k.register_entity("name", ["africa", "africa by toto"])
+        assert k.extract("i want africa by toto playing") == {"name": "africa by toto"}
+
+    def test_filters_applied_when_compiling(self):
+        k = KeywordFeatures(use_automatons=False, ignore_list=["alice"])
+        k.register_entity("first_name", ["alice", "bob", "al"])
+        assert k.extract("alice al bob") == {"first_name": "bob"}
+
+    def test_finalize_compiles_pending_entities(self):
+        k = KeywordFeatures(use_automatons=False)
+        k.register_entity("fruit", ["apple"])
+        k.finalize()
+        assert set(k._compiled) == {"fruit"} and not k._dirty_re
+
+    def test_pattern_recompiled_after_register(self):
+        k = KeywordFeatures(use_automatons=False)
+        k.register_entity("fruit", ["apple"])
+        assert k.extract("a cherry") == {}
+        k.register_entity("fruit", ["cherry"])
+        assert k.extract("a cherry") == {"fruit": "cherry"}
+        k.deregister_entity("fruit")
+        assert k.extract("a cherry") == {}
+
+
 @pytest.mark.skipif(not HAS_AUTOMATON, reason="pyahocorasick not installed")
 class TestAutomatonBackend:
     def test_extract_matches_same_as_regex(self):
@@ -167,6 +248,75 @@ class TestAutomatonBackend:
         result = k.extract("i want an apple ")
         assert result == {"fruit": "apple"}
 
+    def test_default_uses_automaton_when_installed(self):
+        assert KeywordFeatures().use_automatons is True
+
+    def test_single_automaton_matches_all_entities(self):
+        k = KeywordFeatures(use_automatons=True)
+        k.register_entity("fruit", ["apple"])
+        k.register_entity("color", ["red"])
+        assert sorted(k.match("a red apple")) == [("color", "red"), ("fruit", "apple")]
+        # registering marks the automaton stale, it is rebuilt on the next match
+        k.register_entity("pet", ["cat"])
+        assert k.extract("my cat") == {"pet": "cat"}
+        k.deregister_entity("pet")
+        assert k.extract("my cat") == {}
+
+    def test_word_boundary_on_both_sides(self):
+        k = KeywordFeatures(use_automatons=True)
+        k.register_entity("animal", ["cat"])
+        assert k.extract("concat this") == {}
+        assert k.extract("cats") == {}
+        assert k.extract("the cat, again") == {"animal": "cat"}
+
+    @pytest.mark.parametrize("utt", ["cat_food", "cat2", "2cat", "pet-cat", "gato e cat", "écat"])
+    def test_boundaries_agree_with_regex(self, utt):
+        ac = KeywordFeatures(use_automatons=True)
+        rx = KeywordFeatures(use_automatons=False)
+        for k in (ac, rx):
+            k.register_entity("animal", ["cat"])
+        assert ac.extract(utt) == rx.extract(utt)
+
+    @pytest.mark.parametrize("sample,utt,automaton,regex", [
+        ("c++", "c++x", {}, {"animal": "c++"}),
+        ("c++", "c++ x", {"animal": "c++"}, {}),
+        ("Cat", "the cat", {"animal": "Cat"}, {}),
+    ])
+    def test_boundaries_differ_from_regex(self, sample, utt, automaton, regex):
+        ac = KeywordFeatures(use_automatons=True)
+        rx = KeywordFeatures(use_automatons=False)
+        for k in (ac, rx):
+            k.register_entity("animal", [sample])
+        assert ac.extract(utt) == automaton
+        assert rx.extract(utt) == regex
+
+    def test_short_and_ignored_samples_left_out_of_automaton(self):
+        k = KeywordFeatures(use_automatons=True, ignore_list=["alice"])
+        k.register_entity("first_name", ["alice", "bob", "al"])
+        k.finalize()
+        assert sorted(k.automaton.keys()) == ["bob"]
+
+    def test_finalize_builds_once(self, monkeypatch):
+        k = KeywordFeatures(use_automatons=True)
+        k.register_entity("fruit", ["apple"])
+        k.register_entity("color", ["red"])
+        k.finalize()
+        monkeypatch.setattr(k, "_build_automaton", lambda: pytest.fail("rebuilt"))
+        assert k.extract("a red apple") == {"fruit": "apple", "color": "red"}
+
+    def test_word_boundary_with_non_ascii_letters(self):
+        k = KeywordFeatures(use_automatons=True)
+        k.register_entity("drink", ["caf", "café"])
+        # accented letters continue a word, "caf" must not match inside "cafés"
+        assert k.extract("dois cafés") == {}
+        assert k.extract("um café, por favor") == {"drink": "café"}
+
+    def test_ignore_list_uses_lowercased_key(self):
+        k = KeywordFeatures(use_automatons=True, ignore_list=["alice"])
+        k.register_entity("first_name", ["Alice", "Bob"])
+        k.register_entity("person", ["Alice"])
+        assert k.extract("hello alice and bob") == {"first_name": "Bob", "person": "Alice"}
+
     def test_raises_when_lib_missing_but_requested(self, monkeypatch):
         # When ahocorasick IS installed, this path is exercised by the constructor
         # only when the user passes use_automatons=True. The negative branch
@@ -175,6 +325,15 @@ class TestAutomatonBackend:
         assert k.use_automatons is True
 
 
+def test_default_falls_back_to_regex_without_lib(monkeypatch):
+    import linha_fina.keywords as kwmod
+    monkeypatch.setattr(kwmod, "ahocorasick", None)
+    k = KeywordFeatures()
+    assert k.use_automatons is False
+    k.register_entity("fruit", ["apple"])
+    assert k.extract("an apple") == {"fruit": "apple"}
+
+
 def test_use_automatons_without_lib_raises(monkeypatch):
     import linha_fina.keywords as kwmod
     monkeypatch.setattr(kwmod, "ahocorasick", None)
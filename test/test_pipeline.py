@@ -13,9 +13,10 @@ import time
 
 import pytest
 from ovos_bus_client.message import Message
+from ovos_bus_client.session import SessionManager
 from ovos_utils.fakebus import FakeBus
 
-from linha_fina.opm import LinhaFinaPipeline, LinhaFinaIntent, _calc_lf_intent
+from linha_fina.opm import LinhaFinaPipeline, LinhaFinaIntent, _select_lf_intent
 
 
 @pytest.fixture
@@ -133,6 +134,16 @@ class TestRegistrationViaBus:
         assert {"name": "song", "samples": ["africa", "hey jude"], "lang": "en-US"} in pipeline.registered_entities
 
 
+    def test_initial_train_finalizes_keyword_matchers(self, pipeline):
+        container = pipeline.containers["en-US"]
+        container.register_intent("media:play", ["play {song}"],
+                                  entity_samples={"song": ["africa"]})
+        container.register_intent("media:stop", ["stop", "pause"])
+        assert container.k_matchers["media:play"]._dirty is True
+        pipeline.bus.emit(Message("mycroft.ready"))
+        assert container.k_matchers["media:play"]._dirty is False
+
+
 class TestDetach:
     def test_detach_intent_removes_from_all_languages(self, pipeline):
         _register(pipeline, {
@@ -165,7 +176,6 @@ class TestMatching:
             "demo:bye": ["goodbye", "see you", "bye", "later"],
             "demo:thanks": ["thanks", "thank you", "much appreciated"],
         })
-        _calc_lf_intent.cache_clear()
         m = pipeline.match_high(["hello there"], lang="en-US",
                                 message=Message("test", {}))
         # If model didn't reach the high threshold the call returns None — that's
@@ -180,7 +190,6 @@ class TestMatching:
             "demo:bye": ["goodbye", "bye", "see you"],
             "demo:thanks": ["thanks", "thank you", "ty"],
         })
-        _calc_lf_intent.cache_clear()
         # A borderline utterance should be more likely to fire on low than high
         low = pipeline.match_low(["hello"], lang="en-US", message=Message("t", {}))
         if low is not None:
@@ -192,7 +201,6 @@ class TestMatching:
             "demo:bye": ["goodbye", "see you", "bye"],
             "demo:thanks": ["thanks", "thank you", "ty"],
         })
-        _calc_lf_intent.cache_clear()
         m = pipeline.match_medium(["thank you"], lang="en-US",
                                   message=Message("t", {}))
         if m is not None:
@@ -214,19 +222,88 @@ class TestMatching:
             "demo:bye": ["goodbye", "bye", "see you"],
             "demo:thanks": ["thanks", "ty", "thank you"],
         })
-        _calc_lf_intent.cache_clear()
         # Backwards compat: should accept a plain string
         result = pipeline.calc_intent("hello")
         # May be None or a LinhaFinaIntent — both are valid shapes here
         assert result is None or isinstance(result, LinhaFinaIntent)
 
+    def test_calc_intent_picks_best_of_several_utterances(self, pipeline):
+        _register(pipeline, {
+            "demo:greet": ["hello", "hi", "hey"],
+            "demo:bye": ["goodbye", "bye", "see you"],
+            "demo:thanks": ["thanks", "ty", "thank you"],
+        })
+        utterances = ["hello", "goodbye", "thank you"]
+        result = pipeline.calc_intent(utterances, lang="en-US")
+        sess = SessionManager.get(None)
+        container = pipeline.containers["en-US"]
+        expected = [_select_lf_intent(u, container.predict(u), sess) for u in utterances]
+        best = max((i for i in expected if i is not None), key=lambda i: i.conf)
+        assert (result.name, result.sent) == (best.name, best.sent)
+
+    def test_calc_intent_batches_utterances(self, pipeline, monkeypatch):
+        _register(pipeline, {
+            "demo:greet": ["hello", "hi", "hey"],
+            "demo:bye": ["goodbye", "bye", "see you"],
+            "demo:thanks": ["thanks", "ty", "thank you"],
+        })
+        container = pipeline.containers["en-US"]
+        batches = []
+        original = container.predict_many
+        monkeypatch.setattr(container, "predict_many",
+                            lambda qs: batches.append(list(qs)) or original(qs))
+        monkeypatch.setattr(container, "predict", lambda q: pytest.fail("per-utterance predict"))
+        result = pipeline.calc_intent(["hey there", "goodbye"], lang="en-US")
+        assert batches == [["hey there", "goodbye"]]
+        assert result is not None
+
+    def test_calc_intent_drops_utterances_over_max_words(self, pipeline, monkeypatch):
+        _register(pipeline, {
+            "demo:greet": ["hello", "hi", "hey"],
+            "demo:bye": ["goodbye", "bye", "see you"],
+            "demo:thanks": ["thanks", "ty", "thank you"],
+        })
+        pipeline.max_words = 3
+        container = pipeline.containers["en-US"]
+        batches = []
+        original = container.predict_many
+        monkeypatch.setattr(container, "predict_many",
+                            lambda qs: batches.append(list(qs)) or original(qs))
+        pipeline.calc_intent(["hey there", "hey  there\tfriend", "a b c d e"], lang="en-US")
+        assert batches == [["hey there"]]
+
+    def test_match_tiers_share_the_engine_cache(self, pipeline, monkeypatch):
+        _register(pipeline, {
+            "demo:greet": ["hello", "hi", "hey"],
+            "demo:bye": ["goodbye", "bye", "see you"],
+            "demo:thanks": ["thanks", "ty", "thank you"],
+        })
+        container = pipeline.containers["en-US"]
+        container.clear_cache()
+        batches = []
+        original = container.clf.predict_batch
+        monkeypatch.setattr(container.clf, "predict_batch",
+                            lambda qs: batches.append(list(qs)) or original(qs))
+        for matcher in (pipeline.match_high, pipeline.match_medium, pipeline.match_low):
+            matcher(["hello"], lang="en-US", message=Message("t", {}))
+        # the classifier runs once, the lower tiers are served by IntentEngine's ranking cache
+        assert batches == [["hello"]]
+
+    @pytest.mark.parametrize("utterance", ["asdf qwer", "xyzzy", "banana"])
+    def test_match_low_ignores_unknown_words(self, pipeline, utterance):
+        _register(pipeline, {
+            "demo:greet": ["hello", "hi there", "hey"],
+            "demo:bye": ["goodbye", "see you", "bye"],
+            "demo:thanks": ["thanks", "thank you", "much appreciated"],
+        })
+        assert pipeline.match_low([utterance], lang="en-US", message=Message("t", {})) is None
+
     def test_calc_intent_unknown_lang_returns_none(self, pipeline):
         _register(pipeline, {
             "demo:greet": ["hello", "hi", "hey"],
             "demo:bye": ["goodbye", "bye"],
             "demo:thanks": ["thanks", "ty"],
         })
-        _calc_lf_intent.cache_clear()
         # ja-JP has no container and is too far from en-US (distance > 10)
         result = pipeline.calc_intent(["こんにちは"], lang="ja-JP")
         assert result is None
@@ -269,3 +346,8 @@ class TestLanguageRouting:
     def test_closest_lang_unrelated_returns_none(self, pipeline):
         # Japanese to English — distance > 10
         assert pipeline._get_closest_lang("ja-JP") is None
+
+    def test_closest_lang_follows_new_containers(self, pipeline):
+        assert pipeline._get_closest_lang("pt-PT") is None
+        pipeline.containers["pt-PT"] = pipeline._make_engine()
+        assert pipeline._get_closest_lang("pt-PT") == "pt-PT"
@@ -1,8 +1,16 @@
 """Tests for linha_fina.templates."""
 
 import pytest
+from simplematch import Matcher
 
-from linha_fina.templates import TemplateMatcher, expand_template, expand_slots
+try:
+    import hyperscan  # noqa: F401
+    HAS_HYPERSCAN = True
+except ImportError:
+    HAS_HYPERSCAN = False
+
+import linha_fina.templates as templates_mod
+from linha_fina.templates import TemplateMatcher, expand_template, expand_slots, iter_expand_slots
 
 
 class TestExpandTemplate:
@@ -54,6 +62,19 @@ class TestExpandTemplate:
         assert any("tell me a" in s and "joke" in s and "{joke_type}" not in s for s in result)
 
 
+    @pytest.mark.parametrize("template", [
+        "[hello,] (call me|my name is) {name}",
+        "Expand (alternative|choices) into a list of choices.",
+        "sentence[s] can have (pre|suf)fixes mid word too",
+        "do( the | )thing(s|) (old|with) style and( no | )spaces",
+        "play {query} [in ({device_name}|{skill_name}|{zone_name})]",
+    ])
+    def test_sorted_distinct_samples(self, template):
+        from ovos_spec_tools import expand
+        result = expand_template(template)
+        assert result == sorted(set(expand(template)))
+
+
 class TestExpandSlots:
     def test_single_slot_single_value(self):
         result = expand_slots("play {song}", {"song": ["africa"]})
@@ -80,6 +101,16 @@ class TestExpandSlots:
         assert "change the color to red" in result
         assert any("change color to green" in s or "change  color to green" in s for s in result)
 
+    def test_values_are_not_substituted_again(self):
+        result = expand_slots("say {word} at {level}", {"word": ["{level}"], "level": ["low"]})
+        assert result == ["say {level} at low"]
+
+    def test_iter_expand_slots_is_lazy(self):
+        it = iter_expand_slots("set {color} at {level}",
+                               {"color": ["red", "blue"], "level": ["low", "high"]})
+        assert next(it) == "set red at low"
+        assert list(it) == ["set red at high", "set blue at low", "set blue at high"]
+
     def test_unknown_slot_preserved(self):
         # Slot not in dict — placeholder stays
         result = expand_slots("play {song}", {})
@@ -117,8 +148,112 @@ class TestTemplateMatcher:
         assert len(result) >= 1
         assert result[0] == {"song": "africa"}
 
+    def test_templates_compiled_once(self, monkeypatch):
+        tm = TemplateMatcher()
+        tm.add_templates(["play {song}", "put on {song}"])
+        monkeypatch.setattr("simplematch.Matcher._create_regex",
+                            lambda *a: pytest.fail("template recompiled on match"))
+        assert tm.match("play africa") == [{"song": "africa"}]
+
+    def test_ranking_matches_per_template_scores(self):
+        from rapidfuzz import fuzz
+        templates = ["play {song}", "play {song} please", "please play {song} now"]
+        tm = TemplateMatcher()
+        tm.add_templates(templates)
+        query = "please play africa now"
+        expected = sorted(((fuzz.token_set_ratio(t, query), m) for t in templates
+                           if (m := Matcher(t).match(query))),
+                          key=lambda k: k[0], reverse=True)
+        assert tm.match(query) == [m for _, m in expected]
+
+    def test_duplicate_templates_scored_once(self, monkeypatch):
+        import linha_fina.templates as templates
+        tm = TemplateMatcher()
+        tm.add_templates(["play {song}", "play {song}", "play {song} now"])
+        scored = []
+        original = templates.process.cdist
+        monkeypatch.setattr(templates.process, "cdist",
+                            lambda q, c, **kw: scored.append(list(c)) or original(q, c, **kw))
+        assert tm.match("play africa now") == [{"song": "africa"}, {"song": "africa now"},
+                                               {"song": "africa now"}]
+        assert scored == [["play {song}", "play {song} now"]]
+
+    def test_single_hit_skips_scoring(self, monkeypatch):
+        import linha_fina.templates as templates
+        tm = TemplateMatcher()
+        tm.add_templates(["play {song}", "put on {song}"])
+        monkeypatch.setattr(templates.process, "cdist",
+                            lambda *a, **kw: pytest.fail("single hit was scored"))
+        assert tm.match("put on africa") == [{"song": "africa"}]
+
+    def test_literal_prefilter_skips_regex(self, monkeypatch):
+        tm = TemplateMatcher(use_hyperscan=False)
+        tm.add_templates(["play {song}", "hello, {name}!"])
+        (_, matcher), = tm._matchers["song"]
+        monkeypatch.setattr(matcher, "match", lambda q: pytest.fail("literals missing, regex ran"))
+        assert tm.match("hello, bob!") == [{"name": "bob"}]
+
+    def test_templates_dispatched_by_first_word(self, monkeypatch):
+        tm = TemplateMatcher(use_hyperscan=False)
+        tm.add_templates(["play {song}", "{song} now", "replay{song}"])
+        (_, matcher), _, _ = tm._matchers["song"]
+        monkeypatch.setattr(matcher, "match", lambda q: pytest.fail("first word differs, regex ran"))
+        assert tm.match("now play africa now") == [{"song": "now play africa"}]
+        assert tm.match("replayafrica") == [{"song": "africa"}]
+
     def test_two_slot_extraction(self):
         tm = TemplateMatcher()
         tm.add_templates(["set {color} to {level}"])
         result = tm.match("set red to high")
         assert result and result[0] == {"color": "red", "level": "high"}
+
+
+class TestHyperscanBackend:
+    def test_use_hyperscan_without_lib_raises(self, monkeypatch):
+        monkeypatch.setattr(templates_mod, "hyperscan", None)
+        with pytest.raises(ImportError):
+            TemplateMatcher(use_hyperscan=True)
+
+    def test_default_without_lib_tries_templates_in_python(self, monkeypatch):
+        monkeypatch.setattr(templates_mod, "hyperscan", None)
+        tm = TemplateMatcher()
+        assert tm.use_hyperscan is False
+        tm.add_templates(["play {song}"])
+        tm.finalize()
+        assert tm._database is None
+        assert tm.match("play africa") == [{"song": "africa"}]
+
+    @pytest.mark.skipif(not HAS_HYPERSCAN, reason="hyperscan not installed")
+    def test_matches_same_as_python(self):
+        queries = ["play africa", "put on hey jude please", "set red to high", "hello"]
+        templates = ["play {song}", "put on {song} please", "set {color} to {level}"]
+        hs, py = TemplateMatcher(use_hyperscan=True), TemplateMatcher(use_hyperscan=False)
+        for tm in (hs, py):
+            tm.add_templates(templates)
+        hs.finalize()
+        assert hs._database is not None
+        assert [hs.match(q) for q in queries] == [py.match(q) for q in queries]
+
+    @pytest.mark.skipif(not HAS_HYPERSCAN, reason="hyperscan not installed")
+    def test_concurrent_matches(self):
+        import threading
+        tm = TemplateMatcher(use_hyperscan=True)
+        tm.add_templates([f"play {{song}} number {i}" for i in range(300)] + ["play {song}"])
+        expected = tm.match("play africa number 7")
+        barrier = threading.Barrier(8)
+        results, errors = [], []
+
+        def run():
+            barrier.wait()
+            try:
+                results.extend(tm.match("play africa number 7") for _ in range(200))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert errors == []
+        assert len(results) == 1600 and all(r == expected for r in results)